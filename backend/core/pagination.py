@@ -0,0 +1,132 @@
+import base64
+import json
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    صفحه‌بندی keyset (cursor) روی یک ستون مرتب‌سازی + id.
+
+    - به جای OFFSET از شرط (ستون، id) < (مقدار، id) استفاده می‌کنیم،
+      پس صفحه صدم هم مثل صفحه اول فقط یک range scan روی ایندکس است.
+    - COUNT(*) نمی‌زنیم؛ یک ردیف بیشتر می‌خوانیم تا بفهمیم صفحه بعد هست یا نه.
+    - توکن next مات (opaque) است: base64 از [ترتیب، مقدار، id].
+    - فقط وقتی فعال می‌شود که کلاینت پارامتر cursor بفرستد (صفحه اول: ?cursor=)؛
+      بدون آن خروجی همان لیست قبلی می‌ماند، حتی با ?page=&page_size= که
+      InfiniteProducts فرانت می‌فرستد و فقط آرایه ساده قبول می‌کند.
+
+    ستون مرتب‌سازی باید null نداشته باشد.
+    """
+
+    cursor_query_param = "cursor"
+    page_size_query_param = "page_size"
+    page_size = 24
+    max_page_size = 100
+
+    # ترتیب پیش‌فرض؛ view می‌تواند با get_keyset_ordering عوضش کند
+    ordering = ("-last_updated", "-id")
+
+    invalid_cursor_message = "Invalid cursor"
+
+    def is_requested(self, request) -> bool:
+        return self.cursor_query_param in request.query_params
+
+    def get_page_size(self, request) -> int:
+        raw = request.query_params.get(self.page_size_query_param)
+        try:
+            size = int(raw)
+        except (TypeError, ValueError):
+            return self.page_size
+        if size <= 0:
+            return self.page_size
+        return min(size, self.max_page_size)
+
+    def get_ordering(self, view):
+        if view is not None and hasattr(view, "get_keyset_ordering"):
+            return tuple(view.get_keyset_ordering())
+        return tuple(getattr(view, "keyset_ordering", None) or self.ordering)
+
+    # ---------------------------
+    # cursor encode / decode
+    # ---------------------------
+    def encode_cursor(self, ordering: str, value, pk) -> str:
+        if hasattr(value, "isoformat"):
+            value = value.isoformat()
+        if not isinstance(pk, int):
+            # کلید غیرعددی (مثلاً UUID)
+            pk = str(pk)
+        raw = json.dumps([ordering, value, pk], separators=(",", ":"))
+        return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+    def decode_cursor(self, token: str, model, ordering: str):
+        try:
+            padded = token + "=" * (-len(token) % 4)
+            name, value, pk = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+            if name != ordering:
+                raise ValueError("cursor ordering mismatch")
+            value = model._meta.get_field(ordering.lstrip("-")).to_python(value)
+            pk = model._meta.pk.to_python(pk)
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
+        return value, pk
+
+    # ---------------------------
+    # DRF API
+    # ---------------------------
+    def paginate_queryset(self, queryset, request, view=None):
+        if not self.is_requested(request):
+            return None
+
+        self.request = request
+        self.page_size_value = self.get_page_size(request)
+
+        primary, tiebreak = self.get_ordering(view)
+        descending = primary.startswith("-")
+        self.primary = primary
+        self.field_name = primary.lstrip("-")
+
+        queryset = queryset.order_by(primary, tiebreak)
+
+        token = request.query_params.get(self.cursor_query_param)
+        if token:
+            value, pk = self.decode_cursor(token, queryset.model, primary)
+            op = "lt" if descending else "gt"
+            queryset = queryset.filter(
+                Q(**{f"{self.field_name}__{op}": value})
+                | Q(**{self.field_name: value, f"id__{op}": pk})
+            )
+
+        rows = list(queryset[: self.page_size_value + 1])
+        self.has_next = len(rows) > self.page_size_value
+        page = rows[: self.page_size_value]
+
+        self.next_cursor = None
+        if self.has_next and page:
+            last = page[-1]
+            if isinstance(last, dict):
+                value, pk = last[self.field_name], last["id"]
+            else:
+                value, pk = getattr(last, self.field_name), last.pk
+            self.next_cursor = self.encode_cursor(self.primary, value, pk)
+
+        return page
+
+    def get_next_link(self):
+        if not self.next_cursor:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        return Response(
+            {
+                "next": self.get_next_link(),
+                "next_cursor": self.next_cursor,
+                "results": data,
+            }
+        )
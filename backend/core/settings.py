@@ -167,3 +167,39 @@ STORAGES = {
 
 # این خط را به انتهای بخش ۱۱ در settings.py اضافه کن
 AWS_S3_PRECONNECT_CHECK = False
+
+# ۱۲. کش
+# پیش‌فرض LocMem (LRU داخل هر پروسه)؛ در پروداکشن با چند worker بهتر است
+# LOCATION/BACKEND به یک کش مشترک (مثلاً Redis) اشاره کند تا invalidation بین پروسه‌ها هم برسد.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    # کش محصولات (جزئیات سریالایز شده و ...) - با TTL و سقف تعداد (حذف LRU)
+    "products": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "products",
+        "TIMEOUT": config("PRODUCT_CACHE_TIMEOUT", default=300, cast=int),
+        "OPTIONS": {"MAX_ENTRIES": 2000},
+    },
+}
+
+# ۱۳. اقساط اعتبار
+# نرخ سود کل دوره بر اساس تعداد اقساط (تعداد قسط => نرخ)؛ بقیه با نرخ پیش‌فرض
+CREDIT_INTEREST_RATES = {12: "0.08"}
+CREDIT_DEFAULT_INTEREST_RATE = "0.12"
+# فاصله سررسیدها: "30d" (هر ۳۰ روز، مثل قبل) یا "monthly" (همان روز ماه بعد)
+CREDIT_DUE_DATE_CALENDAR = config("CREDIT_DUE_DATE_CALENDAR", default="30d")
+# باقی‌مانده تقسیم مبلغ به کدام اقساط اضافه شود: "first" یا "last"
+CREDIT_REMAINDER_ALLOCATION = "first"
+# جریمه دیرکرد: نرخ روزانه از مبلغ قسط، با سقف نسبت به مبلغ قسط
+CREDIT_LATE_PENALTY_DAILY_RATE = "0.001"
+CREDIT_LATE_PENALTY_MAX_RATE = "0.1"
+
+# ۱۴. سفارش‌ها
+# شناسه worker در کد رهگیری (0 تا 1023)؛ برای هر سرور/پروسه جدا تنظیم شود.
+# خالی => pid پروسه (ممکن است تکراری شود؛ ثبت سفارش با برخورد یک بار با کد تازه تکرار می‌شود)
+ORDER_TRACKING_WORKER_ID = config("ORDER_TRACKING_WORKER_ID", default=None)
+# عمر پاسخ ذخیره‌شده Idempotency-Key و مهلت قفل درخواست در جریان (ثانیه)
+IDEMPOTENCY_KEY_TTL = 24 * 3600
+IDEMPOTENCY_LOCK_TIMEOUT = 60
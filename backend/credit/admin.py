@@ -1,12 +1,85 @@
-from django.contrib import admin
+from django import forms
+from django.contrib import admin, messages
 
-from .models import Wallet, UserAddress, CreditRequest, Installment
+from .models import Wallet, WalletTransaction, UserAddress, CreditRequest, Installment, PaymentCallback
+from .wallet import InsufficientWallet, credit_wallet, debit_wallet
+
+
+class WalletAdminForm(forms.ModelForm):
+    """
+    اصلاح موجودی از ادمین: مبلغ مثبت واریز، منفی برداشت؛ از طریق credit.wallet و با ثبت در دفتر.
+    """
+    adjustment = forms.IntegerField(label="اصلاح موجودی (تومان، منفی = کسر)", required=False)
+    adjustment_reason = forms.ChoiceField(
+        label="علت اصلاح",
+        choices=[
+            (WalletTransaction.REASON_ADJUSTMENT, "اصلاح دستی"),
+            (WalletTransaction.REASON_REFUND, "بازگشت وجه"),
+        ],
+        initial=WalletTransaction.REASON_ADJUSTMENT,
+        required=False,
+    )
+    adjustment_reference = forms.CharField(label="شماره مرجع / توضیح", max_length=64, required=False)
+
+    class Meta:
+        model = Wallet
+        fields = ["user"]
+
+    def clean(self):
+        cleaned = super().clean()
+        amount = cleaned.get("adjustment") or 0
+        if amount < 0 and self.instance.pk and -amount > self.instance.balance:
+            raise forms.ValidationError("موجودی کیف پول برای این کسر کافی نیست.")
+        if amount < 0 and cleaned.get("adjustment_reason") == WalletTransaction.REASON_REFUND:
+            raise forms.ValidationError("بازگشت وجه فقط واریز (مبلغ مثبت) است.")
+        return cleaned
 
 
 @admin.register(Wallet)
 class WalletAdmin(admin.ModelAdmin):
+    form = WalletAdminForm
     list_display = ("id", "user", "balance", "updated_at")
     search_fields = ("user__username", "user__email")
+    # موجودی فقط از طریق credit.wallet (و ثبت در دفتر) عوض شود
+    readonly_fields = ("balance",)
+    fields = ("user", "balance", "adjustment", "adjustment_reason", "adjustment_reference")
+
+    def save_model(self, request, obj, form, change):
+        if not change:
+            super().save_model(request, obj, form, change)
+        elif "user" in form.changed_data:
+            # balance خوانده‌شده در فرم دوباره نوشته نشود (UPDATE های هم‌زمان کیف پول)
+            obj.save(update_fields=["user", "updated_at"])
+
+        amount = form.cleaned_data.get("adjustment") or 0
+        if not amount:
+            return
+        reason = form.cleaned_data.get("adjustment_reason") or WalletTransaction.REASON_ADJUSTMENT
+        reference = form.cleaned_data.get("adjustment_reference") or ""
+        try:
+            if amount > 0:
+                credit_wallet(obj.user, amount, reason=reason, reference=reference)
+            else:
+                debit_wallet(obj.user, -amount, reason=reason, reference=reference)
+        except InsufficientWallet:
+            # موجودی بین نمایش فرم و ذخیره کم شد
+            self.message_user(request, "موجودی کیف پول برای این کسر کافی نیست.", messages.ERROR)
+            return
+        obj.refresh_from_db(fields=["balance", "updated_at"])
+
+
+@admin.register(WalletTransaction)
+class WalletTransactionAdmin(admin.ModelAdmin):
+    list_display = ("id", "wallet", "amount", "balance_after", "reason", "reference", "created_at")
+    list_filter = ("reason",)
+    search_fields = ("reference", "wallet__user__username")
+    readonly_fields = ("wallet", "amount", "balance_after", "reason", "reference", "created_at")
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
 
 
 @admin.register(UserAddress)
@@ -60,6 +133,14 @@ class CreditRequestAdmin(admin.ModelAdmin):
 
 @admin.register(Installment)
 class InstallmentAdmin(admin.ModelAdmin):
-    list_display = ("id", "credit_request", "installment_number", "amount", "due_date", "paid", "paid_at")
-    list_filter = ("paid",)
-    search_fields = ("credit_request__tracking_code", "credit_request__user__username")
\ No newline at end of file
+    list_display = ("id", "credit_request", "installment_number", "amount", "penalty", "due_date", "paid", "is_overdue", "paid_at")
+    list_filter = ("paid", "is_overdue")
+    search_fields = ("credit_request__tracking_code", "credit_request__user__username")
+
+
+@admin.register(PaymentCallback)
+class PaymentCallbackAdmin(admin.ModelAdmin):
+    list_display = ("id", "order_id", "track_id", "status", "result", "received_at", "processed_at")
+    list_filter = ("result", "status")
+    search_fields = ("order_id", "track_id")
+    readonly_fields = ("order_id", "track_id", "status", "payload", "received_at", "processed_at", "result")
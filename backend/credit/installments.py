@@ -0,0 +1,160 @@
+from datetime import date, timedelta
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Dict, Iterable, List
+
+from dateutil.relativedelta import relativedelta
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import CreditRequest, Installment
+
+
+def interest_rate(months: int) -> Decimal:
+    """
+    نرخ سود کل دوره از جدول settings.CREDIT_INTEREST_RATES (پیش‌فرض: ۱۲ قسط ۸٪، بقیه ۱۲٪).
+    """
+    table = getattr(settings, "CREDIT_INTEREST_RATES", {12: "0.08"})
+    default = getattr(settings, "CREDIT_DEFAULT_INTEREST_RATE", "0.12")
+    return Decimal(str(table.get(int(months), default)))
+
+
+def total_payable(amount: int, months: int) -> int:
+    total = Decimal(int(amount or 0)) * (1 + interest_rate(months))
+    return int(total.quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def split_amounts(total: int, months: int, allocation: str = None) -> List[int]:
+    """
+    تقسیم صحیح مبلغ: جمع اقساط دقیقاً = total (باقی‌مانده گم نمی‌شود).
+    باقی‌مانده به صورت ۱ تومان به اولین (یا آخرین) اقساط اضافه می‌شود.
+    """
+    months = max(1, int(months or 1))
+    allocation = allocation or getattr(settings, "CREDIT_REMAINDER_ALLOCATION", "first")
+    base, remainder = divmod(int(total), months)
+    amounts = [base] * months
+    extra = range(remainder) if allocation == "first" else range(months - remainder, months)
+    for i in extra:
+        amounts[i] += 1
+    return amounts
+
+
+def due_dates(start: date, months: int, calendar: str = None) -> List[date]:
+    calendar = calendar or getattr(settings, "CREDIT_DUE_DATE_CALENDAR", "30d")
+    if calendar == "monthly":
+        # relativedelta روز آخر ماه‌های کوتاه‌تر را درست می‌گیرد (۳۱ => ۳۰/۲۹)
+        return [start + relativedelta(months=i) for i in range(1, months + 1)]
+    return [start + timedelta(days=30 * i) for i in range(1, months + 1)]
+
+
+def _period_before(due: date, calendar: str = None) -> date:
+    """
+    شروع تقویم یک جدول از روی سررسید قسط اول (عکس due_dates).
+    """
+    calendar = calendar or getattr(settings, "CREDIT_DUE_DATE_CALENDAR", "30d")
+    if calendar == "monthly":
+        return due - relativedelta(months=1)
+    return due - timedelta(days=30)
+
+
+def build_schedules(requests: Iterable[CreditRequest], start: date = None, starts: Dict = None) -> List[Installment]:
+    """
+    جدول اقساط چند درخواست در یک پیمایش (بدون کوئری)؛
+    مبلغ‌ها و تاریخ‌ها برای هر ترکیب (مبلغ، تعداد) فقط یک بار حساب می‌شوند.
+    starts: شروع تقویم جدا برای بعضی درخواست‌ها ({pk: date})؛ بقیه از start (پیش‌فرض امروز).
+    """
+    start = start or timezone.now().date()
+    starts = starts or {}
+    amounts_cache: Dict[tuple, List[int]] = {}
+    dates_cache: Dict[tuple, List[date]] = {}
+
+    rows = []
+    for req in requests:
+        months = max(1, int(req.installments or 1))
+        key = (int(req.amount or 0), months)
+        if key not in amounts_cache:
+            amounts_cache[key] = split_amounts(total_payable(*key), months)
+        date_key = (starts.get(req.pk, start), months)
+        if date_key not in dates_cache:
+            dates_cache[date_key] = due_dates(*date_key)
+
+        rows.extend(
+            Installment(
+                credit_request_id=req.pk,
+                installment_number=n,
+                amount=amount,
+                due_date=due,
+            )
+            for n, (amount, due) in enumerate(zip(amounts_cache[key], dates_cache[date_key]), start=1)
+        )
+    return rows
+
+
+def late_penalty(amount: int, days_late: int) -> int:
+    """
+    جریمه دیرکرد: مبلغ × نرخ روزانه × روزهای تاخیر، حداکثر مبلغ × سقف.
+    """
+    if days_late <= 0:
+        return 0
+    daily = Decimal(str(getattr(settings, "CREDIT_LATE_PENALTY_DAILY_RATE", "0.001")))
+    cap = Decimal(str(getattr(settings, "CREDIT_LATE_PENALTY_MAX_RATE", "0.1")))
+    amount = Decimal(int(amount or 0))
+    penalty = min(amount * daily * days_late, amount * cap)
+    return int(penalty.quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def create_schedules(
+    requests: Iterable[CreditRequest], start: date = None, batch_size: int = 1000, starts: Dict = None
+):
+    return Installment.objects.bulk_create(build_schedules(requests, start, starts), batch_size=batch_size)
+
+
+@transaction.atomic
+def regenerate_schedules(requests: List[CreditRequest], start: date = None, batch_size: int = 1000) -> int:
+    """
+    محاسبه دوباره مبلغ اقساط (مثلاً بعد از تغییر نرخ) روی همان تقویم قبلی هر درخواست:
+    - جدول کامل => فقط amount با bulk_update؛ سررسید، is_overdue و penalty دست نمی‌خورند
+      (جریمه در اجرای بعدی sweep_overdue_installments با مبلغ تازه حساب می‌شود)
+    - جدول ناقص یا تعداد قسط عوض‌شده => DELETE و ساخت دوباره از شروع همان تقویم
+      (سررسید اولین قسط منهای یک دوره؛ بدون قسط قبلی از start)
+    درخواست‌هایی که قسط پرداخت‌شده دارند دست نمی‌خورند. خروجی: تعداد درخواست‌های بازسازی‌شده.
+    """
+    existing: Dict = {}
+    locked = set()
+    rows = (
+        Installment.objects.filter(credit_request_id__in=[r.pk for r in requests])
+        .only("id", "credit_request_id", "installment_number", "amount", "due_date", "paid")
+        .order_by("credit_request_id", "installment_number")
+    )
+    for inst in rows:
+        existing.setdefault(inst.credit_request_id, []).append(inst)
+        if inst.paid:
+            locked.add(inst.credit_request_id)
+
+    amounts_cache: Dict[tuple, List[int]] = {}
+    changed, rebuild, starts = [], [], {}
+    for req in requests:
+        if req.pk in locked:
+            continue
+        months = max(1, int(req.installments or 1))
+        current = existing.get(req.pk, [])
+        if [i.installment_number for i in current] != list(range(1, months + 1)):
+            if current:
+                starts[req.pk] = _period_before(current[0].due_date)
+            rebuild.append(req)
+            continue
+
+        key = (int(req.amount or 0), months)
+        if key not in amounts_cache:
+            amounts_cache[key] = split_amounts(total_payable(*key), months)
+        for inst, amount in zip(current, amounts_cache[key]):
+            if inst.amount != amount:
+                inst.amount = amount
+                changed.append(inst)
+
+    if changed:
+        Installment.objects.bulk_update(changed, ["amount"], batch_size=batch_size)
+    if rebuild:
+        Installment.objects.filter(credit_request_id__in=[r.pk for r in rebuild]).delete()
+        create_schedules(rebuild, start, batch_size=batch_size, starts=starts)
+    return len(requests) - len(locked)
@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from credit.payments import process_batch
+
+
+class Command(BaseCommand):
+    help = 'پردازش کال‌بک‌های درگاه که ConfirmPaymentAPIView در inbox ثبت کرده (cron یا --loop)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200, help='تعداد کال‌بک در هر تراکنش')
+        parser.add_argument('--loop', action='store_true', help='بعد از خالی شدن صف هم منتظر کال‌بک‌های جدید بمان')
+        parser.add_argument('--sleep', type=float, default=1.0, help='فاصله بررسی صف در حالت --loop (ثانیه)')
+
+    def handle(self, *args, **options):
+        batch_size = max(1, options['batch_size'])
+        total = 0
+        started = time.monotonic()
+
+        while True:
+            n = process_batch(batch_size)
+            total += n
+            if n:
+                continue
+            if not options['loop']:
+                break
+            time.sleep(options['sleep'])
+
+        elapsed = max(time.monotonic() - started, 1e-6)
+        self.stdout.write(self.style.SUCCESS(f'{total} کال‌بک پردازش شد ({total / elapsed:.0f} در ثانیه).'))
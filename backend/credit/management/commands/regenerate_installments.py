@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from credit.installments import regenerate_schedules
+from credit.models import CreditRequest
+
+
+class Command(BaseCommand):
+    help = 'ساخت دوباره جدول اقساط درخواست‌های تکمیل‌شده (مثلاً بعد از تغییر نرخ سود)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='تعداد درخواست در هر دسته')
+        parser.add_argument('--installments', type=int, help='فقط درخواست‌هایی با این تعداد قسط')
+
+    def handle(self, *args, **options):
+        batch_size = max(1, options['batch_size'])
+
+        qs = CreditRequest.objects.filter(status='completed').only('id', 'amount', 'installments').order_by('pk')
+        if options.get('installments'):
+            qs = qs.filter(installments=options['installments'])
+
+        # هر دسته: خواندن اقساط موجود + bulk_update مبلغ روی همان سررسیدها (درخواست‌های دارای قسط پرداخت‌شده رد می‌شوند)
+        done = skipped = 0
+        batch = []
+        for req in qs.iterator(chunk_size=batch_size):
+            batch.append(req)
+            if len(batch) >= batch_size:
+                n = regenerate_schedules(batch)
+                done, skipped = done + n, skipped + len(batch) - n
+                batch = []
+        if batch:
+            n = regenerate_schedules(batch)
+            done, skipped = done + n, skipped + len(batch) - n
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{done} جدول اقساط بازسازی شد؛ {skipped} درخواست به خاطر قسط پرداخت‌شده رد شد.'
+        ))
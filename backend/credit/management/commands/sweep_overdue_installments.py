@@ -0,0 +1,68 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from credit.installments import late_penalty
+from credit.models import Installment
+
+
+class Command(BaseCommand):
+    help = 'علامت‌گذاری اقساط معوق و محاسبه جریمه دیرکرد (برای cron؛ حافظه ثابت، قابل ادامه)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000, help='تعداد ردیف در هر خواندن / bulk_update')
+        parser.add_argument('--after-id', type=int, default=0, help='ادامه از بعد از این id (از خروجی اجرای قبلی)')
+        parser.add_argument('--date', type=date.fromisoformat, help='تاریخ مبنا YYYY-MM-DD (پیش‌فرض: امروز)')
+
+    def handle(self, *args, **options):
+        chunk_size = max(1, options['chunk_size'])
+        today = options.get('date') or timezone.localdate()
+        started = time.monotonic()
+
+        # اقساطی که بعد از پرداخت هنوز علامت معوق دارند (یک UPDATE)
+        cleared = Installment.objects.filter(paid=True, is_overdue=True).update(is_overdue=False)
+
+        qs = (
+            Installment.objects.filter(paid=False, due_date__lt=today, id__gt=options['after_id'])
+            .order_by('id')
+            .only('id', 'amount', 'due_date', 'is_overdue', 'penalty')
+        )
+
+        scanned = updated = 0
+        last_id = options['after_id']
+        changed = []
+        for inst in qs.iterator(chunk_size=chunk_size):
+            scanned += 1
+            last_id = inst.id
+            penalty = late_penalty(inst.amount, (today - inst.due_date).days)
+            if inst.is_overdue and inst.penalty == penalty:
+                continue
+            inst.is_overdue = True
+            inst.penalty = penalty
+            changed.append(inst)
+
+            if len(changed) >= chunk_size:
+                updated += self._flush(changed)
+                changed = []
+                self._progress(scanned, updated, last_id, started)
+
+        if changed:
+            updated += self._flush(changed)
+
+        self._progress(scanned, updated, last_id, started)
+        self.stdout.write(self.style.SUCCESS(
+            f'پایان: {scanned} قسط معوق بررسی، {updated} به‌روزرسانی، {cleared} علامت پرداخت‌شده پاک شد.'
+        ))
+
+    def _flush(self, changed):
+        Installment.objects.bulk_update(changed, ['is_overdue', 'penalty'])
+        return len(changed)
+
+    def _progress(self, scanned, updated, last_id, started):
+        elapsed = max(time.monotonic() - started, 1e-6)
+        self.stdout.write(
+            f'{scanned} بررسی / {updated} به‌روزرسانی - {scanned / elapsed:.0f} ردیف در ثانیه - '
+            f'ادامه با --after-id {last_id}'
+        )
@@ -0,0 +1,55 @@
+# Generated by Django 4.2.27 on 2026-10-17 22:37
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def record_opening_balances(apps, schema_editor):
+    """
+    موجودی فعلی هر کیف پول یک ردیف opening در دفتر می‌شود تا جمع دفتر = balance.
+    """
+    Wallet = apps.get_model("credit", "Wallet")
+    WalletTransaction = apps.get_model("credit", "WalletTransaction")
+
+    batch = []
+    for wallet_id, balance in Wallet.objects.exclude(balance=0).values_list("id", "balance").iterator():
+        batch.append(
+            WalletTransaction(wallet_id=wallet_id, amount=balance, balance_after=balance, reason="opening")
+        )
+        if len(batch) >= 500:
+            WalletTransaction.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        WalletTransaction.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('credit', '0002_creditrequest_birth_date_creditrequest_full_name_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WalletTransaction',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.BigIntegerField()),
+                ('balance_after', models.BigIntegerField()),
+                ('reason', models.CharField(choices=[('opening', 'موجودی اولیه'), ('order_payment', 'پرداخت سفارش'), ('credit_deposit', 'واریز اعتبار'), ('refund', 'بازگشت وجه'), ('adjustment', 'اصلاح دستی')], max_length=20)),
+                ('reference', models.CharField(blank=True, db_index=True, default='', max_length=64)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('wallet', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='transactions', to='credit.wallet')),
+            ],
+            options={
+                'ordering': ['-created_at', '-id'],
+                'indexes': [models.Index(fields=['wallet', '-created_at', '-id'], name='wallet_tx_wallet_created_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='wallettransaction',
+            constraint=models.UniqueConstraint(condition=models.Q(('reason', 'credit_deposit')), fields=('reference',), name='wallet_tx_unique_credit_deposit'),
+        ),
+        migrations.RunPython(record_opening_balances, migrations.RunPython.noop),
+    ]
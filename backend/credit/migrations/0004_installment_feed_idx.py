@@ -0,0 +1,17 @@
+# Generated by Django 4.2.27 on 2026-10-17 22:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('credit', '0003_wallet_transaction'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='installment',
+            index=models.Index(fields=['credit_request', 'paid', 'due_date'], name='installment_req_paid_due_idx'),
+        ),
+    ]
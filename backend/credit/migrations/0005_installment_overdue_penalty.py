@@ -0,0 +1,23 @@
+# Generated by Django 4.2.27 on 2026-10-17 22:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('credit', '0004_installment_feed_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='installment',
+            name='is_overdue',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='installment',
+            name='penalty',
+            field=models.BigIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.27 on 2026-10-17 22:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('credit', '0005_installment_overdue_penalty'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='creditrequest',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='creditreq_user_created_idx'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.27 on 2026-10-17 22:43
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('credit', '0006_creditrequest_user_created_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PaymentCallback',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('order_id', models.CharField(max_length=100)),
+                ('track_id', models.CharField(blank=True, default='', max_length=100)),
+                ('status', models.CharField(blank=True, default='', max_length=20)),
+                ('payload', models.JSONField(blank=True, default=dict)),
+                ('received_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+                ('result', models.CharField(blank=True, default='', max_length=20)),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('processed_at__isnull', True)), fields=['id'], name='paycb_pending_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='paymentcallback',
+            constraint=models.UniqueConstraint(fields=('order_id', 'track_id'), name='paycb_order_track_uniq'),
+        ),
+    ]
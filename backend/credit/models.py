@@ -1,8 +1,7 @@
 import uuid
-from datetime import timedelta
 
 from django.conf import settings
-from django.db import models
+from django.db import IntegrityError, models, transaction
 from django.utils import timezone
 from django.db.models.signals import post_save
 from django.dispatch import receiver
@@ -21,6 +20,53 @@ class Wallet(models.Model):
         return f"Wallet({self.user_id}) = {self.balance}"
 
 
+class WalletTransaction(models.Model):
+    """
+    دفتر (ledger) فقط-افزودنی کیف پول: هر تغییر موجودی یک ردیف.
+    مجموع amount ها = Wallet.balance (تراکنش‌های debit منفی هستند).
+    """
+    REASON_OPENING = "opening"
+    REASON_ORDER = "order_payment"
+    REASON_CREDIT = "credit_deposit"
+    REASON_REFUND = "refund"
+    REASON_ADJUSTMENT = "adjustment"
+
+    REASON_CHOICES = [
+        (REASON_OPENING, "موجودی اولیه"),
+        (REASON_ORDER, "پرداخت سفارش"),
+        (REASON_CREDIT, "واریز اعتبار"),
+        (REASON_REFUND, "بازگشت وجه"),
+        (REASON_ADJUSTMENT, "اصلاح دستی"),
+    ]
+
+    wallet = models.ForeignKey(Wallet, on_delete=models.CASCADE, related_name="transactions")
+    # مثبت = واریز، منفی = برداشت (تومان)
+    amount = models.BigIntegerField()
+    # موجودی بعد از همین تراکنش
+    balance_after = models.BigIntegerField()
+    reason = models.CharField(max_length=20, choices=REASON_CHOICES)
+    # شناسه مرجع (کد رهگیری سفارش / درخواست اعتبار)
+    reference = models.CharField(max_length=64, blank=True, default="", db_index=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ["-created_at", "-id"]
+        indexes = [
+            models.Index(fields=["wallet", "-created_at", "-id"], name="wallet_tx_wallet_created_idx"),
+        ]
+        constraints = [
+            # هر درخواست اعتبار فقط یک بار به کیف پول واریز می‌شود
+            models.UniqueConstraint(
+                fields=["reference"],
+                condition=models.Q(reason="credit_deposit"),
+                name="wallet_tx_unique_credit_deposit",
+            ),
+        ]
+
+    def __str__(self):
+        return f"WalletTx({self.wallet_id}) {self.amount:+} => {self.balance_after}"
+
+
 class UserAddress(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="addresses")
     fullName = models.CharField(max_length=120)
@@ -82,6 +128,10 @@ class CreditRequest(models.Model):
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            # لیست درخواست‌های کاربر (صفحه‌بندی keyset روی created_at, id)
+            models.Index(fields=["user", "-created_at", "-id"], name="creditreq_user_created_idx"),
+        ]
 
     def __str__(self):
         return f"{self.user_id} - {self.tracking_code} - {self.status}"
@@ -98,14 +148,56 @@ class Installment(models.Model):
     paid = models.BooleanField(default=False)
     paid_at = models.DateTimeField(null=True, blank=True)
 
+    # با دستور sweep_overdue_installments پر می‌شوند
+    is_overdue = models.BooleanField(default=False)
+    penalty = models.BigIntegerField(default=0)  # جریمه دیرکرد (تومان)
+
     class Meta:
         ordering = ["installment_number"]
         unique_together = ("credit_request", "installment_number")
+        indexes = [
+            # فید اقساط کاربر: فیلتر پرداخت‌شده/معوق/آینده روی due_date
+            models.Index(fields=["credit_request", "paid", "due_date"], name="installment_req_paid_due_idx"),
+        ]
 
     def __str__(self):
         return f"{self.credit_request.tracking_code} - #{self.installment_number} - {self.amount}"
 
 
+class PaymentCallback(models.Model):
+    """
+    صندوق ورودی (inbox) کال‌بک‌های درگاه: ConfirmPaymentAPIView فقط همین ردیف را
+    می‌نویسد و سریع جواب می‌دهد؛ دستور process_payment_callbacks بعداً اعمالشان می‌کند.
+    کال‌بک تکراری (همان order_id و track_id) ردیف جدید نمی‌سازد.
+    """
+    RESULT_APPROVED = "approved"
+    RESULT_UPDATED = "updated"
+    RESULT_REJECTED = "rejected"
+    RESULT_IGNORED = "ignored"
+    RESULT_NOT_FOUND = "not_found"
+
+    order_id = models.CharField(max_length=100)  # همان tracking_code درخواست اعتبار
+    track_id = models.CharField(max_length=100, blank=True, default="")
+    status = models.CharField(max_length=20, blank=True, default="")  # وضعیت خام از درگاه
+    payload = models.JSONField(default=dict, blank=True)
+
+    received_at = models.DateTimeField(default=timezone.now)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    result = models.CharField(max_length=20, blank=True, default="")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["order_id", "track_id"], name="paycb_order_track_uniq"),
+        ]
+        indexes = [
+            # صف کارهای باقی‌مانده برای worker
+            models.Index(fields=["id"], condition=models.Q(processed_at__isnull=True), name="paycb_pending_idx"),
+        ]
+
+    def __str__(self):
+        return f"PaymentCallback({self.order_id}, {self.track_id}) {self.result or 'pending'}"
+
+
 @receiver(post_save, sender=settings.AUTH_USER_MODEL)
 def create_wallet_for_user(sender, instance, created, **kwargs):
     if created:
@@ -122,26 +214,26 @@ def handle_credit_request_completed(sender, instance: CreditRequest, created, **
     if instance.status != "completed":
         return
 
-    # ۱) واریز به کیف پول (فقط یکبار)
+    # ۱) واریز به کیف پول (فقط یکبار)؛ فلگ مسیر سریع است و قید یکتای دفتر
+    #    (reference = کد رهگیری درخواست) جلوی واریز دوباره در save های هم‌زمان/قدیمی را می‌گیرد
     if not instance.credited_to_wallet:
-        wallet, _ = Wallet.objects.get_or_create(user=instance.user)
-        wallet.balance = int(wallet.balance) + int(instance.amount or 0)
-        wallet.save(update_fields=["balance", "updated_at"])
+        from .wallet import credit_wallet
 
+        CreditRequest.objects.filter(pk=instance.pk).update(credited_to_wallet=True)
         instance.credited_to_wallet = True
-        instance.save(update_fields=["credited_to_wallet"])
-
-    # ۲) ساخت اقساط (اگر قبلاً ساخته نشده باشند)
+        try:
+            with transaction.atomic():
+                credit_wallet(
+                    instance.user,
+                    int(instance.amount or 0),
+                    reason=WalletTransaction.REASON_CREDIT,
+                    reference=instance.tracking_code,
+                )
+        except IntegrityError:
+            pass  # قبلاً واریز شده
+
+    # ۲) ساخت اقساط (اگر قبلاً ساخته نشده باشند) - یک bulk_create با موتور credit.installments
     if not instance.installments_list.exists():
-        interest_rate = 0.08 if int(instance.installments) == 12 else 0.12
-        total_payable = int(instance.amount or 0) * (1 + interest_rate)
-        monthly_amount = int(total_payable / int(instance.installments or 1))
-        start_date = timezone.now().date()
-
-        for i in range(1, int(instance.installments) + 1):
-            Installment.objects.create(
-                credit_request=instance,
-                installment_number=i,
-                amount=monthly_amount,
-                due_date=start_date + timedelta(days=30 * i),
-            )
\ No newline at end of file
+        from .installments import create_schedules
+
+        create_schedules([instance])
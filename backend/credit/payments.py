@@ -0,0 +1,69 @@
+from django.db import transaction
+from django.utils import timezone
+
+from .models import CreditRequest, PaymentCallback
+
+
+def enqueue_callback(order_id: str, track_id: str, payment_status: str, payload=None):
+    """
+    ثبت کال‌بک در inbox؛ خروجی: (ردیف، تازه ساخته شد؟). تکراری فقط خوانده می‌شود.
+    """
+    return PaymentCallback.objects.get_or_create(
+        order_id=str(order_id)[:100],
+        track_id=str(track_id or "")[:100],
+        defaults={"status": str(payment_status or "")[:20], "payload": payload or {}},
+    )
+
+
+def _apply(callback: PaymentCallback, credit_request: CreditRequest) -> str:
+    """
+    انتقال وضعیت با UPDATE شرطی؛ اجرای دوباره همان کال‌بک نتیجه را عوض نمی‌کند.
+    - paid روی pending => approved (+ اطلاعات پرداخت)
+    - paid روی بقیه وضعیت‌ها => فقط اطلاعات پرداخت
+    - ناموفق فقط درخواستی را که هنوز pending است رد می‌کند
+    """
+    if credit_request is None:
+        return PaymentCallback.RESULT_NOT_FOUND
+
+    requests = CreditRequest.objects.filter(pk=credit_request.pk)
+    now = timezone.now()
+    if callback.status == "paid":
+        payment = {"payment_track_id": callback.track_id, "payment_date": callback.received_at, "updated_at": now}
+        if requests.filter(status="pending").update(status="approved", **payment):
+            return PaymentCallback.RESULT_APPROVED
+        requests.update(**payment)
+        return PaymentCallback.RESULT_UPDATED
+
+    if requests.filter(status="pending").update(
+        status="rejected", payment_track_id=callback.track_id, updated_at=now
+    ):
+        return PaymentCallback.RESULT_REJECTED
+    return PaymentCallback.RESULT_IGNORED
+
+
+@transaction.atomic
+def process_batch(batch_size: int = 200) -> int:
+    """
+    یک دسته از کال‌بک‌های پردازش‌نشده (به ترتیب دریافت).
+    چند worker هم‌زمان با skip_locked دسته‌های جدا برمی‌دارند.
+    خروجی: تعداد کال‌بک‌های پردازش‌شده.
+    """
+    callbacks = list(
+        PaymentCallback.objects.select_for_update(skip_locked=True)
+        .filter(processed_at__isnull=True)
+        .order_by("id")[:batch_size]
+    )
+    if not callbacks:
+        return 0
+
+    # همه درخواست‌های این دسته با یک کوئری (tracking_code کلید in_bulk است؛ defer نشود)
+    requests = CreditRequest.objects.only("id", "status", "tracking_code").in_bulk(
+        {cb.order_id for cb in callbacks}, field_name="tracking_code"
+    )
+    now = timezone.now()
+    for cb in callbacks:
+        cb.result = _apply(cb, requests.get(cb.order_id))
+        cb.processed_at = now
+
+    PaymentCallback.objects.bulk_update(callbacks, ["result", "processed_at"])
+    return len(callbacks)
@@ -129,5 +129,5 @@ class CreditRequestSerializer(serializers.ModelSerializer):
 class InstallmentSerializer(serializers.ModelSerializer):
     class Meta:
         model = Installment
-        fields = ["id", "installment_number", "amount", "due_date", "paid", "paid_at"]
-        read_only_fields = ["id"]
\ No newline at end of file
+        fields = ["id", "installment_number", "amount", "due_date", "paid", "paid_at", "is_overdue", "penalty"]
+        read_only_fields = ["id", "is_overdue", "penalty"]
\ No newline at end of file
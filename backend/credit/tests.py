@@ -1,7 +1,18 @@
-from django.test import TestCase
+from datetime import date, timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
 from django.contrib.auth.models import User
+from django.db.models import Sum
 from rest_framework.test import APIClient
 
+from .installments import due_dates, split_amounts, total_payable
+from .payments import enqueue_callback, process_batch
+from .models import CreditRequest, Installment, PaymentCallback, Wallet, WalletTransaction
+from .wallet import InsufficientWallet, credit_wallet, debit_wallet
+
 
 class CreditSmokeTest(TestCase):
     def setUp(self):
@@ -17,3 +28,320 @@ class CreditSmokeTest(TestCase):
     def test_addresses_empty(self):
         res = self.client.get("/api/user-addresses/")
         self.assertEqual(res.status_code, 200)
+
+
+class WalletLedgerTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="buyer", password="12345678")
+
+    def _balance(self):
+        return Wallet.objects.get(user=self.user).balance
+
+    def test_credit_and_debit_are_recorded(self):
+        credit_wallet(self.user, 1000, reason=WalletTransaction.REASON_REFUND, reference="R1")
+        tx = debit_wallet(self.user, 400, reference="TRK-1")
+        self.assertEqual(tx.amount, -400)
+        self.assertEqual(tx.balance_after, 600)
+        self.assertEqual(self._balance(), 600)
+        total = WalletTransaction.objects.filter(wallet__user=self.user).aggregate(s=Sum("amount"))["s"]
+        self.assertEqual(total, self._balance())
+
+    def test_insufficient_debit_changes_nothing(self):
+        credit_wallet(self.user, 100, reason=WalletTransaction.REASON_REFUND)
+        with self.assertRaises(InsufficientWallet) as ctx:
+            debit_wallet(self.user, 150)
+        self.assertEqual((ctx.exception.balance, ctx.exception.need), (100, 50))
+        self.assertEqual(self._balance(), 100)
+        self.assertEqual(WalletTransaction.objects.count(), 1)
+
+    def test_completed_credit_request_deposits_once(self):
+        req = CreditRequest.objects.create(user=self.user, amount=5000, installments=12)
+        req.status = "completed"
+        req.save()
+        # نسخه قدیمی همان درخواست (credited_to_wallet=False در حافظه) دوباره ذخیره می‌شود
+        stale = CreditRequest.objects.get(pk=req.pk)
+        stale.credited_to_wallet = False
+        stale.save()
+        self.assertEqual(self._balance(), 5000)
+        tx = WalletTransaction.objects.get()
+        self.assertEqual((tx.reason, tx.reference), (WalletTransaction.REASON_CREDIT, req.tracking_code))
+
+
+    # صفحه ادمین رندر می‌شود؛ بدون manifest استاتیک (collectstatic) در تست
+    @override_settings(STORAGES={
+        "default": {"BACKEND": "django.core.files.storage.InMemoryStorage"},
+        "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+    })
+    def test_admin_adjustment_goes_through_ledger(self):
+        credit_wallet(self.user, 1000, reason=WalletTransaction.REASON_REFUND)
+        wallet = Wallet.objects.get(user=self.user)
+        admin_user = User.objects.create_superuser("admin", password="x")
+        self.client.force_login(admin_user)
+        url = f"/admin/credit/wallet/{wallet.pk}/change/"
+
+        def post(amount, reason=WalletTransaction.REASON_ADJUSTMENT):
+            return self.client.post(url, {
+                "user": self.user.pk,
+                "adjustment": amount,
+                "adjustment_reason": reason,
+                "adjustment_reference": "ticket-7",
+            })
+
+        self.assertEqual(post(-300).status_code, 302)
+        self.assertEqual(post(50, WalletTransaction.REASON_REFUND).status_code, 302)
+        self.assertEqual(self._balance(), 750)
+        tx = WalletTransaction.objects.filter(reason=WalletTransaction.REASON_ADJUSTMENT).get()
+        self.assertEqual((tx.amount, tx.balance_after, tx.reference), (-300, 700, "ticket-7"))
+
+        # کسر بیشتر از موجودی => خطای فرم، بدون تغییر
+        self.assertEqual(post(-5000).status_code, 200)
+        self.assertEqual(self._balance(), 750)
+
+
+class InstallmentScheduleTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="buyer", password="12345678")
+
+    def test_split_keeps_remainder(self):
+        self.assertEqual(split_amounts(100, 3), [34, 33, 33])
+        self.assertEqual(split_amounts(100, 3, allocation="last"), [33, 33, 34])
+
+    def test_rate_table_and_calendar(self):
+        self.assertEqual(total_payable(1000000, 12), 1080000)
+        self.assertEqual(total_payable(1000000, 6), 1120000)
+        with self.settings(CREDIT_INTEREST_RATES={6: "0.05"}):
+            self.assertEqual(total_payable(1000000, 6), 1050000)
+        self.assertEqual(
+            due_dates(date(2026, 1, 31), 2, calendar="monthly"), [date(2026, 2, 28), date(2026, 3, 31)]
+        )
+
+    def test_completed_request_creates_exact_schedule(self):
+        req = CreditRequest.objects.create(user=self.user, amount=1000001, installments=12)
+        req.status = "completed"
+        req.save()
+        amounts = list(req.installments_list.values_list("amount", flat=True))
+        self.assertEqual(len(amounts), 12)
+        self.assertEqual(sum(amounts), total_payable(1000001, 12))
+
+    def test_regenerate_skips_requests_with_paid_installments(self):
+        reqs = []
+        for _ in range(3):
+            req = CreditRequest.objects.create(user=self.user, amount=1200, installments=12, status="completed")
+            reqs.append(req)
+        Installment.objects.filter(credit_request=reqs[0], installment_number=1).update(paid=True)
+        # جدول قدیمی: سررسیدها از تقویم قبلی و قسط اول معوق شده (sweeper)
+        old_start = date(2025, 1, 1)
+        for inst in reqs[1].installments_list.all():
+            inst.due_date = old_start + timedelta(days=30 * inst.installment_number)
+            inst.save()
+        reqs[1].installments_list.filter(installment_number=1).update(is_overdue=True, penalty=10)
+        due_before = list(reqs[1].installments_list.order_by("installment_number").values_list("due_date", flat=True))
+
+        with self.settings(CREDIT_INTEREST_RATES={12: "0"}):
+            call_command("regenerate_installments", stdout=StringIO())
+
+        self.assertEqual(sum(reqs[1].installments_list.values_list("amount", flat=True)), 1200)
+        self.assertEqual(sum(reqs[0].installments_list.values_list("amount", flat=True)), 1296)
+        due_after = list(reqs[1].installments_list.order_by("installment_number").values_list("due_date", flat=True))
+        self.assertEqual(due_after, due_before)
+        first = reqs[1].installments_list.get(installment_number=1)
+        self.assertEqual((first.is_overdue, first.penalty), (True, 10))
+
+    def test_regenerate_rebuilds_partial_schedule_on_original_calendar(self):
+        req = CreditRequest.objects.create(user=self.user, amount=1200, installments=12, status="completed")
+        first_due = req.installments_list.get(installment_number=1).due_date - timedelta(days=90)
+        req.installments_list.filter(installment_number=1).update(due_date=first_due)
+        req.installments_list.filter(installment_number__gt=3).delete()
+
+        call_command("regenerate_installments", stdout=StringIO())
+
+        dues = list(req.installments_list.order_by("installment_number").values_list("due_date", flat=True))
+        self.assertEqual(dues, [first_due + timedelta(days=30 * i) for i in range(12)])
+
+
+class MyInstallmentsFeedTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="buyer", password="12345678")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        today = timezone.localdate()
+        for amount in (1000, 2000):
+            req = CreditRequest.objects.create(user=self.user, amount=amount, installments=3)
+            Installment.objects.bulk_create([
+                Installment(credit_request=req, installment_number=1, amount=amount,
+                            due_date=today - timedelta(days=40), paid=True),
+                Installment(credit_request=req, installment_number=2, amount=amount,
+                            due_date=today - timedelta(days=10)),
+                Installment(credit_request=req, installment_number=3, amount=amount,
+                            due_date=today + timedelta(days=20)),
+            ])
+        other = User.objects.create_user(username="other", password="12345678")
+        req = CreditRequest.objects.create(user=other, amount=5, installments=1)
+        Installment.objects.create(credit_request=req, installment_number=1, amount=5, due_date=today)
+
+    def test_lists_all_requests_in_one_query(self):
+        with self.assertNumQueries(1):
+            res = self.client.get("/api/my-installments/")
+        self.assertEqual(len(res.data), 6)
+        self.assertTrue(res.data[0]["is_paid"])
+        self.assertIn("tracking_code", res.data[0])
+
+    def test_status_filter(self):
+        res = self.client.get("/api/my-installments/", {"status": "overdue"})
+        self.assertEqual([r["installment_number"] for r in res.data], [2, 2])
+        self.assertTrue(all(r["is_overdue"] for r in res.data))
+
+    def test_totals(self):
+        with self.assertNumQueries(2):
+            res = self.client.get("/api/my-installments/", {"totals": 1, "status": "upcoming"})
+        self.assertEqual(len(res.data["results"]), 2)
+        totals = res.data["totals"]
+        self.assertEqual(totals["overdue_amount"], 3000)
+        self.assertEqual(totals["overdue_count"], 2)
+        self.assertEqual(totals["remaining_amount"], 6000)
+        self.assertEqual(totals["paid_amount"], 3000)
+        self.assertEqual(totals["next_due_date"], timezone.localdate() + timedelta(days=20))
+
+
+class SweepOverdueTest(TestCase):
+    def setUp(self):
+        user = User.objects.create_user(username="buyer", password="12345678")
+        self.req = CreditRequest.objects.create(user=user, amount=0, installments=3)
+        today = timezone.localdate()
+        self.late = Installment.objects.create(
+            credit_request=self.req, installment_number=1, amount=100000, due_date=today - timedelta(days=10)
+        )
+        self.very_late = Installment.objects.create(
+            credit_request=self.req, installment_number=2, amount=100000, due_date=today - timedelta(days=400)
+        )
+        self.future = Installment.objects.create(
+            credit_request=self.req, installment_number=3, amount=100000, due_date=today + timedelta(days=5)
+        )
+
+    def _sweep(self, **kwargs):
+        out = StringIO()
+        call_command("sweep_overdue_installments", chunk_size=1, stdout=out, **kwargs)
+        for inst in (self.late, self.very_late, self.future):
+            inst.refresh_from_db()
+        return out.getvalue()
+
+    def test_marks_overdue_and_penalty(self):
+        out = self._sweep()
+        self.assertEqual((self.late.is_overdue, self.late.penalty), (True, 1000))
+        # سقف ۱۰٪
+        self.assertEqual((self.very_late.is_overdue, self.very_late.penalty), (True, 10000))
+        self.assertEqual((self.future.is_overdue, self.future.penalty), (False, 0))
+        self.assertIn(f"--after-id {self.very_late.id}", out)
+
+    def test_resume_after_id(self):
+        self._sweep(after_id=self.late.id)
+        self.assertFalse(self.late.is_overdue)
+        self.assertTrue(self.very_late.is_overdue)
+
+    def test_paid_installments_are_cleared(self):
+        self._sweep()
+        Installment.objects.filter(pk=self.late.pk).update(paid=True)
+        self._sweep()
+        self.assertFalse(self.late.is_overdue)
+
+
+class MyCreditRequestsListTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="buyer", password="12345678")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.requests = [
+            CreditRequest.objects.create(user=self.user, amount=1000 * i, installments=12) for i in range(5)
+        ]
+        CreditRequest.objects.create(user=User.objects.create_user(username="other", password="x"))
+
+    def test_single_narrow_query(self):
+        with self.assertNumQueries(1) as ctx:
+            res = self.client.get("/api/my-requests/")
+        self.assertNotIn("salary_slip", ctx.captured_queries[0]["sql"])
+        self.assertEqual(len(res.data), 5)
+        self.assertEqual(
+            set(res.data[0]), {"id", "tracking_code", "amount", "installments", "status", "created_at"}
+        )
+
+    def test_cursor_pagination_with_uuid_keys(self):
+        res = self.client.get("/api/my-requests/", {"page_size": 2, "cursor": ""})
+        ids = [r["id"] for r in res.data["results"]]
+        while res.data["next_cursor"]:
+            res = self.client.get("/api/my-requests/", {"page_size": 2, "cursor": res.data["next_cursor"]})
+            ids += [r["id"] for r in res.data["results"]]
+        expected = CreditRequest.objects.filter(user=self.user).order_by("-created_at", "-id")
+        self.assertEqual(ids, [str(r.id) for r in expected])
+
+
+class PaymentCallbackTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        user = User.objects.create_user(username="buyer", password="12345678")
+        self.req = CreditRequest.objects.create(user=user, amount=1000, installments=12)
+
+    def _callback(self, track_id="T1", payment_status="paid"):
+        return self.client.post(
+            "/api/confirm-payment/",
+            {"order_id": self.req.tracking_code, "track_id": track_id, "status": payment_status},
+            format="json",
+        )
+
+    def _process(self):
+        call_command("process_payment_callbacks", stdout=StringIO())
+        self.req.refresh_from_db()
+
+    def test_callback_is_queued_and_deduplicated(self):
+        # فقط inbox: SELECT تکراری + INSERT (داخل savepoint) - هیچ کوئری روی CreditRequest
+        with self.assertNumQueries(4):
+            res = self._callback()
+        self.assertEqual(res.status_code, 202)
+        self.assertFalse(res.data["duplicate"])
+        self.assertTrue(self._callback().data["duplicate"])
+        self.assertEqual(PaymentCallback.objects.count(), 1)
+        # تا worker اجرا نشود وضعیت عوض نمی‌شود
+        self.req.refresh_from_db()
+        self.assertEqual(self.req.status, "pending")
+
+    def test_worker_applies_transition_once(self):
+        self._callback()
+        self._process()
+        self.assertEqual((self.req.status, self.req.payment_track_id), ("approved", "T1"))
+        self.assertEqual(PaymentCallback.objects.get().result, PaymentCallback.RESULT_APPROVED)
+
+        # کال‌بک ناموفق دیرتر رسیده، درخواست تأییدشده را رد نمی‌کند
+        self._callback(track_id="T2", payment_status="failed")
+        self._process()
+        self.assertEqual(self.req.status, "approved")
+        self.assertEqual(
+            PaymentCallback.objects.get(track_id="T2").result, PaymentCallback.RESULT_IGNORED
+        )
+
+    def test_batch_query_count(self):
+        user = User.objects.get(username="buyer")
+        for i in range(10):
+            req = CreditRequest.objects.create(user=user, amount=1000, installments=12)
+            enqueue_callback(req.tracking_code, f"B{i}", "paid")
+        # savepoint + قفل دسته + درخواست‌ها (یک in_bulk) + یک UPDATE برای هر کال‌بک + bulk_update
+        with self.assertNumQueries(2 + 1 + 1 + 10 + 1):
+            self.assertEqual(process_batch(), 10)
+        self.assertEqual(CreditRequest.objects.filter(status="approved").count(), 10)
+
+    def test_anonymous_idempotency_key_scoped_by_order(self):
+        other = CreditRequest.objects.create(user=self.req.user, amount=500, installments=12)
+        for order_id in (self.req.tracking_code, other.tracking_code):
+            res = self.client.post(
+                "/api/confirm-payment/",
+                {"order_id": order_id, "track_id": "T1", "status": "paid"},
+                format="json",
+                HTTP_IDEMPOTENCY_KEY="same-key",
+            )
+            # کلید یکسان دو کلاینت ناشناس پاسخ دیگری را برنمی‌گرداند
+            self.assertEqual(res.status_code, 202)
+            self.assertEqual(res.data["tracking_code"], order_id)
+        self.assertEqual(PaymentCallback.objects.count(), 2)
+
+    def test_unknown_order(self):
+        self.client.post("/api/confirm-payment/", {"order_id": "NOPE", "status": "paid"}, format="json")
+        self._process()
+        self.assertEqual(PaymentCallback.objects.get().result, PaymentCallback.RESULT_NOT_FOUND)
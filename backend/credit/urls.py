@@ -8,6 +8,7 @@ from .views import (
     MyCreditRequestDetailAPIView,
     CreditRequestCreateAPIView,
     CreditRequestInstallmentsAPIView,
+    MyInstallmentsAPIView,
     ConfirmPaymentAPIView,
     RegisterAfterPaymentAPIView,  # 🔴 اضافه شده
 )
@@ -35,4 +36,7 @@ urlpatterns = [
 
     # ✅ اقساط یک درخواست
     path("my-requests/<uuid:credit_id>/installments/", CreditRequestInstallmentsAPIView.as_view(), name="installments"),
+
+    # ✅ همه اقساط کاربر (داشبورد) در یک درخواست
+    path("my-installments/", MyInstallmentsAPIView.as_view(), name="my-installments"),
 ]
\ No newline at end of file
@@ -1,4 +1,7 @@
+from django.db.models import Count, F, Min, Q, Sum
+from django.db.models.functions import Coalesce
 from django.db.utils import OperationalError
+from django.utils import timezone
 from django.shortcuts import get_object_or_404
 from django.contrib.auth.models import User
 
@@ -7,7 +10,11 @@ from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from core.pagination import KeysetPagination
+from orders.idempotency import idempotent
+
 from .models import Wallet, UserAddress, CreditRequest, Installment
+from .payments import enqueue_callback
 from .serializers import (
     UserProfileSerializer,
     UserAddressSerializer,
@@ -57,30 +64,41 @@ class UserAddressDetailAPIView(generics.RetrieveUpdateDestroyAPIView):
 
 
 class MyCreditRequestsAPIView(generics.ListAPIView):
+    """
+    لیست درخواست‌های اعتبار کاربر با یک کوئری باریک (values؛ بدون فایل‌ها و اطلاعات هویتی).
+    با ?cursor= (صفحه اول خالی، همراه ?page_size=) صفحه‌بندی keyset روی (created_at, id) فعال می‌شود.
+    جزئیات کامل فقط در MyCreditRequestDetailAPIView.
+    """
     permission_classes = [IsAuthenticated]
-    
+    pagination_class = KeysetPagination
+    keyset_ordering = ("-created_at", "-id")
+
+    LIST_FIELDS = ("id", "tracking_code", "amount", "installments", "status", "created_at")
+
     def get_queryset(self):
-        return CreditRequest.objects.filter(user=self.request.user).order_by("-created_at")
+        return (
+            CreditRequest.objects.filter(user=self.request.user)
+            .order_by(*self.keyset_ordering)
+            .values(*self.LIST_FIELDS)
+        )
 
     def list(self, request, *args, **kwargs):
         try:
             queryset = self.get_queryset()
-            data = []
-            for credit_request in queryset:
-                data.append({
-                    "id": str(credit_request.id),
-                    "tracking_code": credit_request.tracking_code,
-                    "amount": credit_request.amount,
-                    "installments": credit_request.installments,
-                    "status": credit_request.status,
-                    "created_at": credit_request.created_at.isoformat(),
-                })
-            return Response(data)
+            page = self.paginate_queryset(queryset)
+            rows = page if page is not None else list(queryset)
+            data = [
+                {**row, "id": str(row["id"]), "created_at": row["created_at"].isoformat()}
+                for row in rows
+            ]
         except OperationalError:
             return Response(
                 {"detail": "migration_required", "hint": "python manage.py makemigrations && python manage.py migrate"},
                 status=status.HTTP_503_SERVICE_UNAVAILABLE,
             )
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
 
 
 class MyCreditRequestDetailAPIView(APIView):
@@ -179,9 +197,65 @@ class CreditRequestInstallmentsAPIView(generics.ListAPIView):
         )
 
 
+class MyInstallmentsAPIView(APIView):
+    """
+    همه اقساط کاربر (از همه درخواست‌ها) با یک کوئری:
+    - ?status=paid|overdue|upcoming
+    - ?totals=1 => {"results": [...], "totals": {...}} (جمع‌ها با aggregate در SQL)
+    بدون totals همان لیست ساده‌ای است که صفحه اقساط فرانت انتظار دارد.
+    """
+    permission_classes = [IsAuthenticated]
+
+    FIELDS = ("id", "credit_request_id", "installment_number", "amount", "penalty", "due_date", "paid", "paid_at")
+
+    def get(self, request):
+        today = timezone.localdate()
+        qs = Installment.objects.filter(credit_request__user=request.user)
+
+        status_filter = (request.query_params.get("status") or "").strip().lower()
+        if status_filter == "paid":
+            rows_qs = qs.filter(paid=True)
+        elif status_filter == "overdue":
+            rows_qs = qs.filter(paid=False, due_date__lt=today)
+        elif status_filter == "upcoming":
+            rows_qs = qs.filter(paid=False, due_date__gte=today)
+        else:
+            rows_qs = qs
+
+        rows = list(
+            rows_qs.order_by("due_date", "installment_number", "id")
+            .values(*self.FIELDS, tracking_code=F("credit_request__tracking_code"))
+        )
+        for row in rows:
+            row["credit_request_id"] = str(row["credit_request_id"])
+            row["is_paid"] = row["paid"]
+            row["is_overdue"] = not row["paid"] and row["due_date"] < today
+
+        if request.query_params.get("totals") not in ("1", "true"):
+            return Response(rows)
+
+        unpaid = Q(paid=False)
+        overdue = Q(paid=False, due_date__lt=today)
+        totals = qs.aggregate(
+            remaining_amount=Coalesce(Sum("amount", filter=unpaid), 0),
+            paid_amount=Coalesce(Sum("amount", filter=Q(paid=True)), 0),
+            overdue_amount=Coalesce(Sum("amount", filter=overdue), 0),
+            overdue_count=Count("id", filter=overdue),
+            penalty_amount=Coalesce(Sum("penalty", filter=unpaid), 0),
+            next_due_date=Min("due_date", filter=Q(paid=False, due_date__gte=today)),
+        )
+        return Response({"results": rows, "totals": totals})
+
+
 class ConfirmPaymentAPIView(APIView):
+    """
+    کال‌بک درگاه: فقط در inbox (PaymentCallback) ثبت و فوراً 202 برمی‌گردد؛
+    تغییر وضعیت درخواست را دستور process_payment_callbacks انجام می‌دهد.
+    کال‌بک تکراری با همان (order_id, track_id) دوباره ثبت/پردازش نمی‌شود.
+    """
     permission_classes = [AllowAny]
     
+    @idempotent("credit.confirm_payment", anon_key_field="order_id")
     def post(self, request):
         data = request.data
         order_id = data.get('order_id')
@@ -193,53 +267,23 @@ class ConfirmPaymentAPIView(APIView):
                 {"error": "order_id is required"}, 
                 status=status.HTTP_400_BAD_REQUEST
             )
-        
-        try:
-            credit_request = CreditRequest.objects.get(tracking_code=order_id)
-        except CreditRequest.DoesNotExist:
-            return Response(
-                {"error": "Credit request not found"}, 
-                status=status.HTTP_404_NOT_FOUND
-            )
-        
-        if payment_status == "paid":
-            if credit_request.status == "pending":
-                credit_request.status = "approved"
-                credit_request.payment_track_id = track_id
-                credit_request.payment_date = datetime.now()
-                credit_request.save()
-                
-                return Response({
-                    "success": True,
-                    "message": "Payment confirmed and credit request approved",
-                    "tracking_code": credit_request.tracking_code,
-                    "new_status": credit_request.status,
-                    "full_name": credit_request.full_name,
-                    "amount": credit_request.amount,
-                    "installments": credit_request.installments
-                }, status=status.HTTP_200_OK)
-            else:
-                credit_request.payment_track_id = track_id
-                credit_request.payment_date = datetime.now()
-                credit_request.save()
-                
-                return Response({
-                    "success": True,
-                    "message": "Payment info updated (request was already processed)",
-                    "current_status": credit_request.status,
-                    "tracking_code": credit_request.tracking_code
-                }, status=status.HTTP_200_OK)
-        else:
-            credit_request.status = "rejected"
-            credit_request.payment_track_id = track_id
-            credit_request.save()
-            
-            return Response({
-                "success": False,
-                "message": "Payment failed, credit request rejected",
-                "tracking_code": credit_request.tracking_code,
-                "new_status": credit_request.status
-            }, status=status.HTTP_200_OK)
+
+        callback, created = enqueue_callback(
+            order_id, track_id, payment_status, payload=_json_payload(data)
+        )
+        return Response({
+            "success": True,
+            "queued": True,
+            "duplicate": not created,
+            "tracking_code": callback.order_id,
+        }, status=status.HTTP_202_ACCEPTED)
+
+
+def _json_payload(data) -> dict:
+    try:
+        return json.loads(json.dumps(dict(data.items()), default=str))
+    except Exception:
+        return {}
 
 
 class RegisterAfterPaymentAPIView(APIView):
@@ -0,0 +1,60 @@
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Wallet, WalletTransaction
+
+
+class InsufficientWallet(Exception):
+    def __init__(self, balance: int, need: int):
+        self.balance = int(balance)
+        self.need = int(need)
+        super().__init__("insufficient_wallet")
+
+
+def _record(user, amount: int, reason: str, reference: str) -> WalletTransaction:
+    # ردیف کیف پول را همین تراکنش با UPDATE قفل کرده؛ این خواندن همان موجودی نهایی است
+    wallet_id, balance = Wallet.objects.filter(user=user).values_list("id", "balance").get()
+    return WalletTransaction.objects.create(
+        wallet_id=wallet_id,
+        amount=amount,
+        balance_after=balance,
+        reason=reason,
+        reference=reference or "",
+    )
+
+
+@transaction.atomic
+def debit_wallet(user, amount: int, reason: str = WalletTransaction.REASON_ORDER, reference: str = ""):
+    """
+    برداشت با یک UPDATE شرطی:
+        UPDATE wallet SET balance = balance - x WHERE user_id = ? AND balance >= x
+    بدون select_for_update و read-modify-write؛ اگر ردیفی عوض نشد موجودی کافی نیست.
+    """
+    amount = int(amount or 0)
+    if amount <= 0:
+        return None
+
+    updated = Wallet.objects.filter(user=user, balance__gte=amount).update(
+        balance=F("balance") - amount, updated_at=timezone.now()
+    )
+    if not updated:
+        balance = Wallet.objects.filter(user=user).values_list("balance", flat=True).first() or 0
+        raise InsufficientWallet(balance=balance, need=amount - int(balance))
+    return _record(user, -amount, reason, reference)
+
+
+@transaction.atomic
+def credit_wallet(user, amount: int, reason: str, reference: str = ""):
+    """
+    واریز با F() (بدون خواندن قبلی)؛ اگر کیف پول نبود ساخته می‌شود.
+    """
+    amount = int(amount or 0)
+    if amount <= 0:
+        return None
+
+    updated = Wallet.objects.filter(user=user).update(balance=F("balance") + amount, updated_at=timezone.now())
+    if not updated:
+        Wallet.objects.get_or_create(user=user)
+        Wallet.objects.filter(user=user).update(balance=F("balance") + amount, updated_at=timezone.now())
+    return _record(user, amount, reason, reference)
@@ -0,0 +1,140 @@
+import functools
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+HEADER = "Idempotency-Key"
+MAX_KEY_LENGTH = 64
+
+
+def _ttl() -> timedelta:
+    return timedelta(seconds=int(getattr(settings, "IDEMPOTENCY_KEY_TTL", 24 * 3600)))
+
+
+def _lease() -> timedelta:
+    return timedelta(seconds=int(getattr(settings, "IDEMPOTENCY_LOCK_TIMEOUT", 60)))
+
+
+def _abandoned(record: IdempotencyKey, now) -> bool:
+    """
+    ردیف در جریان که مهلتش تمام شده (پروسه وسط کار کشته شد و پاکش نکرد).
+    ردیف‌های قبل از locked_until با created_at سنجیده می‌شوند.
+    """
+    if record.response is not None:
+        return False
+    locked_until = record.locked_until or record.created_at + _lease()
+    return locked_until <= now
+
+
+def _request_hash(request) -> str:
+    try:
+        body = json.dumps(request.data, sort_keys=True, default=str)
+    except Exception:
+        body = repr(request.data)
+    return hashlib.sha256(body.encode("utf-8")).hexdigest()
+
+
+def _replay(record: IdempotencyKey) -> Response:
+    res = Response(record.response, status=record.status_code)
+    res["Idempotent-Replayed"] = "true"
+    return res
+
+
+def idempotent(scope: str, anon_key_field: str = None):
+    """
+    دکوریتور متد post یک view:
+    - بدون هدر Idempotency-Key همان رفتار قبلی
+    - کلید تکراری => همان پاسخ ذخیره‌شده، بدون اجرای دوباره (قیمت‌گذاری/کیف پول/سفارش)
+    - کلید تکراری با بدنه متفاوت => 422 ، درخواست اول هنوز در جریان => 409
+    فقط پاسخ‌های 2xx ذخیره می‌شوند؛ خطا کلید را آزاد می‌کند تا کلاینت دوباره تلاش کند.
+    ردیف در جریان فقط تا locked_until قفل است؛ بعد از آن درخواست بعدی آن را برمی‌دارد.
+    کلید به کاربر محدود است؛ کاربر ناشناس فضای کلید مشترک دارد، پس فقط با anon_key_field
+    (فیلدی از بدنه مثل order_id) محدود می‌شود و بدون آن idempotency برایش اجرا نمی‌شود.
+    """
+
+    def decorator(view_method):
+        @functools.wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            raw_key = (request.headers.get(HEADER) or "").strip()
+            if not raw_key:
+                return view_method(self, request, *args, **kwargs)
+            if len(raw_key) > MAX_KEY_LENGTH:
+                return Response({"detail": "invalid_idempotency_key"}, status=status.HTTP_400_BAD_REQUEST)
+
+            if request.user and request.user.is_authenticated:
+                owner = request.user.pk
+            else:
+                scoped = str(request.data.get(anon_key_field) or "") if anon_key_field else ""
+                if not scoped:
+                    return view_method(self, request, *args, **kwargs)
+                # هش تا طول ستون key از مقدار دلخواه کلاینت بیشتر نشود
+                owner = "anon:" + hashlib.sha256(f"{anon_key_field}={scoped}".encode("utf-8")).hexdigest()[:16]
+            key = f"{owner}:{raw_key}"
+            request_hash = _request_hash(request)
+            now = timezone.now()
+
+            record = IdempotencyKey.objects.filter(scope=scope, key=key).first()
+            if record is not None and record.expires_at <= now:
+                record.delete()
+                record = None
+
+            if record is None:
+                try:
+                    record = IdempotencyKey.objects.create(
+                        scope=scope,
+                        key=key,
+                        request_hash=request_hash,
+                        locked_until=now + _lease(),
+                        expires_at=now + _ttl(),
+                    )
+                except IntegrityError:
+                    # درخواست هم‌زمان با همین کلید زودتر ثبت شد
+                    record = IdempotencyKey.objects.filter(scope=scope, key=key).first()
+                    if record is None:
+                        return Response({"detail": "request_in_progress"}, status=status.HTTP_409_CONFLICT)
+                else:
+                    return _run(view_method, self, request, record, *args, **kwargs)
+
+            if _abandoned(record, now):
+                # UPDATE شرطی: از چند تلاش هم‌زمان فقط یکی ردیف رها شده را برمی‌دارد
+                taken = IdempotencyKey.objects.filter(
+                    pk=record.pk, response__isnull=True, locked_until=record.locked_until
+                ).update(request_hash=request_hash, locked_until=now + _lease(), expires_at=now + _ttl())
+                if not taken:
+                    return Response({"detail": "request_in_progress"}, status=status.HTTP_409_CONFLICT)
+                return _run(view_method, self, request, record, *args, **kwargs)
+
+            if record.request_hash != request_hash:
+                return Response({"detail": "idempotency_key_reused"}, status=422)
+            if record.response is None:
+                return Response({"detail": "request_in_progress"}, status=status.HTTP_409_CONFLICT)
+            return _replay(record)
+
+        return wrapper
+
+    return decorator
+
+
+def _run(view_method, view, request, record, *args, **kwargs):
+    try:
+        response = view_method(view, request, *args, **kwargs)
+    except BaseException:
+        # SystemExit/KeyboardInterrupt هم کلید را آزاد کند؛ SIGKILL را locked_until پوشش می‌دهد
+        record.delete()
+        raise
+
+    if 200 <= response.status_code < 300 and hasattr(response, "data"):
+        record.status_code = response.status_code
+        record.response = response.data
+        record.save(update_fields=["status_code", "response"])
+    else:
+        record.delete()
+    return response
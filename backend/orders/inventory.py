@@ -0,0 +1,111 @@
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import F
+
+from products.cache import bump_catalog_version, invalidate_product
+from products.models import Product, ProductVariant
+
+
+class OutOfStock(Exception):
+    def __init__(self, product_id: int, variant_id=None, requested: int = 0):
+        self.product_id = product_id
+        self.variant_id = variant_id
+        self.requested = int(requested)
+        super().__init__("out_of_stock")
+
+
+def _sku_quantities(lines):
+    """
+    خطوط سبد => ({product_id: تعداد}, {variant_id: تعداد}, محصولات لمس‌شده)
+    - خط با وریانت: موجودی همان وریانت
+    - خط بدون وریانت: موجودی خود محصول
+    چند خط از یک SKU با هم جمع می‌شوند.
+    """
+    products, variants = Counter(), Counter()
+    touched = set()
+    for product_id, variant_id, qty in lines:
+        touched.add(product_id)
+        if variant_id:
+            variants[variant_id] += qty
+        else:
+            products[product_id] += qty
+    return products, variants, touched
+
+
+def _apply(lines, sign: int, conditional: bool):
+    """
+    ترتیب ثابت قفل سطرها: اول محصولات، بعد وریانت‌ها (هر کدام به ترتیب id)، تا دو checkout
+    هم‌زمان قفل‌ها را برعکس نگیرند. خط وریانت فقط سطر همان وریانت را قفل می‌کند.
+    last_updated دست نمی‌خورد (کلید مرتب‌سازی newest و cursor ها)؛ کهنگی با پاک کردن
+    کش جزئیات و جلو بردن نسخه کاتالوگ (ETag ها) بعد از commit اعلام می‌شود.
+    """
+    products, variants, touched = _sku_quantities(lines)
+
+    for pk in sorted(products):
+        qty = products[pk]
+        qs = Product.objects.filter(pk=pk)
+        if conditional:
+            qs = qs.filter(stock__gte=qty)
+        if not qs.update(stock=F("stock") + sign * qty) and conditional:
+            raise OutOfStock(pk, requested=qty)
+
+    for pk in sorted(variants):
+        qty = variants[pk]
+        qs = ProductVariant.objects.filter(pk=pk)
+        if conditional:
+            qs = qs.filter(stock__gte=qty)
+        if not qs.update(stock=F("stock") + sign * qty) and conditional:
+            product_id = ProductVariant.objects.filter(pk=pk).values_list("product_id", flat=True).first()
+            raise OutOfStock(product_id, variant_id=pk, requested=qty)
+
+    for pk in touched:
+        transaction.on_commit(lambda pk=pk: invalidate_product(pk))
+    transaction.on_commit(bump_catalog_version)
+
+
+@transaction.atomic
+def reserve_stock(lines):
+    """
+    کم کردن اتمی موجودی برای هر SKU با یک UPDATE شرطی:
+        UPDATE ... SET stock = stock - n WHERE id = ? AND stock >= n
+    بدون select_for_update و خواندن قبلی؛ اگر ردیفی عوض نشد موجودی کافی نیست.
+    باید داخل تراکنش سفارش صدا زده شود تا با خطا همه کم‌کردن‌ها برگردند.
+
+    lines: [(product_id, variant_id یا None, تعداد)]
+    """
+    _apply(lines, sign=-1, conditional=True)
+
+
+@transaction.atomic
+def release_stock(lines):
+    """
+    برگرداندن موجودی رزرو شده (مثلاً لغو سفارش).
+    """
+    _apply(lines, sign=1, conditional=False)
+
+
+def order_lines(order):
+    return list(order.items.values_list("product_id", "variant_id", "quantity"))
+
+
+@transaction.atomic
+def cancel_order(order) -> bool:
+    """
+    لغو سفارش با UPDATE شرطی روی وضعیت؛ فقط اولین لغو موجودی را برمی‌گرداند
+    (لغو دوباره یا هم‌زمان چیزی را دو بار اضافه نمی‌کند).
+    موجودی فقط برای سفارشی برمی‌گردد که هنگام ثبت رزرو کرده (stock_reserved_at).
+    """
+    from .models import Order
+
+    updated = (
+        Order.objects.filter(pk=order.pk)
+        .exclude(status=Order.STATUS_CANCELED)
+        .update(status=Order.STATUS_CANCELED)
+    )
+    order.status = Order.STATUS_CANCELED
+    if not updated:
+        return False
+    if order.stock_reserved_at:
+        release_stock(order_lines(order))
+    return True
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.27 on 2026-10-17 22:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0004_order_user_created_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='stock_reserved_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
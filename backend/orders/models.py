@@ -1,8 +1,10 @@
-from django.db import models
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from django.utils import timezone
 
-from products.models import Product
+from products.models import Product, ProductVariant
+from .tracking import new_tracking_number
 
 
 class Order(models.Model):
@@ -44,16 +46,36 @@ class Order(models.Model):
     address = models.JSONField(default=dict, blank=True)
 
     created_at = models.DateTimeField(default=timezone.now)
+    # زمان رزرو موجودی هنگام ثبت؛ سفارش‌های قدیمی (قبل از رزرو موجودی) خالی می‌مانند
+    # و لغوشان چیزی به موجودی برنمی‌گرداند
+    stock_reserved_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # تاریخچه سفارش‌های کاربر (صفحه‌بندی keyset روی created_at, id)
+            models.Index(fields=["user", "-created_at", "-id"], name="order_user_created_idx"),
+        ]
 
     def save(self, *args, **kwargs):
         creating = self.pk is None
-        super().save(*args, **kwargs)
 
-        # tracking_number را بعد از اینکه pk داریم بساز تا یکتا و تمیز باشد
-        if (creating or not self.tracking_number) and not self.tracking_number:
-            ts = timezone.now().strftime("%y%m%d%H%M%S")
-            self.tracking_number = f"TRK-{ts}-{self.user_id}-{self.pk}"
-            Order.objects.filter(pk=self.pk).update(tracking_number=self.tracking_number)
+        # tracking_number قبل از INSERT ساخته می‌شود (زمان‌مرتب و یکتا، بدون نیاز به pk)
+        if not self.tracking_number:
+            self.tracking_number = new_tracking_number()
+            update_fields = kwargs.get("update_fields")
+            if update_fields is not None and "tracking_number" not in update_fields:
+                kwargs["update_fields"] = list(update_fields) + ["tracking_number"]
+
+        if creating or self.status != self.STATUS_CANCELED:
+            super().save(*args, **kwargs)
+            return
+
+        # لغو از ادمین/کد: تغییر وضعیت و برگشت موجودی در یک تراکنش
+        from .inventory import cancel_order
+
+        with transaction.atomic():
+            cancel_order(self)
+            super().save(*args, **kwargs)
 
     @property
     def status_label(self):
@@ -66,6 +88,9 @@ class Order(models.Model):
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name="items")
     product = models.ForeignKey(Product, on_delete=models.PROTECT, related_name="order_items")
+    variant = models.ForeignKey(
+        ProductVariant, on_delete=models.SET_NULL, null=True, blank=True, related_name="order_items"
+    )
 
     product_title_snapshot = models.CharField(max_length=255, blank=True)
     product_image_snapshot = models.CharField(max_length=500, blank=True)
@@ -73,22 +98,46 @@ class OrderItem(models.Model):
     quantity = models.PositiveIntegerField(default=1)
     price = models.BigIntegerField(default=0)  # قیمت واحد در زمان خرید
 
-    def save(self, *args, **kwargs):
+    def fill_snapshots(self):
+        """
+        snapshot عنوان/عکس محصول؛ جدا از save تا bulk_create هم از آن استفاده کند.
+        """
         if not self.product_title_snapshot:
             self.product_title_snapshot = getattr(self.product, "title", "") or ""
 
         if not self.product_image_snapshot:
-            img = ""
-            if hasattr(self.product, "image_url") and self.product.image_url:
-                img = str(self.product.image_url)
-            elif hasattr(self.product, "image") and self.product.image:
-                try:
-                    img = self.product.image.url
-                except Exception:
-                    img = ""
-            self.product_image_snapshot = img
+            # همان ترتیب thumbnail در ?view=summary: image_url بعد عکس اصلی گالری
+            self.product_image_snapshot = self.product.image_url or self.product.primary_image_url or ""
 
+    def save(self, *args, **kwargs):
+        self.fill_snapshots()
         super().save(*args, **kwargs)
 
     def __str__(self):
         return f"OrderItem#{self.pk} - Order#{self.order_id} - Product#{self.product_id}"
+
+
+class IdempotencyKey(models.Model):
+    """
+    پاسخ ذخیره‌شده برای هدر Idempotency-Key (تلاش دوباره کلاینت موبایل بعد از timeout).
+    response خالی یعنی درخواست اول هنوز در حال اجراست.
+    """
+    scope = models.CharField(max_length=50)  # مثلاً "orders.submit"
+    key = models.CharField(max_length=100)  # "<user_id|anon:هش فیلد بدنه>:<هدر>"
+    request_hash = models.CharField(max_length=64)
+
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    response = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+
+    created_at = models.DateTimeField(default=timezone.now)
+    # مهلت درخواست در جریان؛ بعد از آن ردیف رها شده حساب می‌شود
+    locked_until = models.DateTimeField(null=True, blank=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["scope", "key"], name="idempotency_scope_key_uniq"),
+        ]
+
+    def __str__(self):
+        return f"{self.scope}:{self.key} ({self.status_code or 'in-progress'})"
@@ -0,0 +1,125 @@
+from typing import List
+
+from django.http import Http404
+from rest_framework.exceptions import ValidationError
+
+from products.models import Product, ProductVariant
+
+
+def _get_unit_price(obj, fallback: int = 0) -> int:
+    """
+    تلاش می‌کنیم با هر اسم فیلدی که در Product (یا وریانت) داری قیمت را پیدا کنیم.
+    """
+    candidate_fields = [
+        "final_price",
+        "discounted_price",
+        "sale_price",
+        "price",
+        "current_price",
+        "amount",
+    ]
+    for f in candidate_fields:
+        if hasattr(obj, f):
+            try:
+                v = int(getattr(obj, f) or 0)
+                if v > 0:
+                    return v
+            except Exception:
+                continue
+    try:
+        return int(fallback or 0)
+    except Exception:
+        return 0
+
+
+class BasketLine:
+    __slots__ = ("product", "variant", "quantity", "unit_price")
+
+    def __init__(self, product, variant, quantity: int, unit_price: int):
+        self.product = product
+        self.variant = variant
+        self.quantity = quantity
+        self.unit_price = unit_price
+
+    @property
+    def total(self) -> int:
+        return self.unit_price * self.quantity
+
+
+class Basket:
+    """
+    نتیجه قیمت‌گذاری سبد: خطوط با قیمت واحد از دیتابیس + جمع کل.
+    """
+
+    def __init__(self, lines: List[BasketLine]):
+        self.lines = lines
+
+    @property
+    def subtotal(self) -> int:
+        return sum(line.total for line in self.lines)
+
+    def stock_lines(self):
+        """
+        ورودی orders.inventory.reserve_stock: [(product_id, variant_id, تعداد)]
+        """
+        return [
+            (line.product.pk, line.variant.pk if line.variant else None, line.quantity)
+            for line in self.lines
+        ]
+
+    def create_items(self, order):
+        """
+        همه آیتم‌های سفارش با یک bulk_create (snapshot ها همین‌جا پر می‌شوند
+        چون bulk_create متد save را صدا نمی‌زند).
+        """
+        from .models import OrderItem
+
+        items = []
+        for line in self.lines:
+            item = OrderItem(
+                order=order,
+                product=line.product,
+                variant=line.variant,
+                quantity=line.quantity,
+                price=line.unit_price,
+            )
+            item.fill_snapshots()
+            items.append(item)
+        return OrderItem.objects.bulk_create(items)
+
+
+def price_basket(items) -> Basket:
+    """
+    قیمت‌گذاری سبد با دو کوئری ثابت (محصولات + وریانت‌های انتخاب‌شده)،
+    مستقل از تعداد خطوط سبد.
+
+    items: [{"product": id, "quantity": n, "variant": id?, "price": fallback?}]
+    - محصول ناموجود => 404 (مثل get_object_or_404 قبلی)
+    - وریانتی که مال همان محصول نباشد => invalid_variant
+    """
+    product_ids = {it.get("product") for it in items}
+    variant_ids = {it.get("variant") for it in items if it.get("variant")}
+
+    products = Product.objects.in_bulk(product_ids)
+    variants = ProductVariant.objects.in_bulk(variant_ids) if variant_ids else {}
+
+    lines = []
+    for it in items:
+        product = products.get(it.get("product"))
+        if product is None:
+            raise Http404("No Product matches the given query.")
+
+        qty = int(it.get("quantity") or 1)
+        variant = None
+        if it.get("variant"):
+            variant = variants.get(it["variant"])
+            if variant is None or variant.product_id != product.pk:
+                raise ValidationError({"detail": "invalid_variant", "variant": it["variant"]})
+            # final_price به base_sale_price محصول نیاز دارد؛ کوئری اضافه نزنیم
+            variant.product = product
+            unit_price = _get_unit_price(variant, fallback=it.get("price", 0))
+        else:
+            unit_price = _get_unit_price(product, fallback=it.get("price", 0))
+
+        lines.append(BasketLine(product, variant, qty, unit_price))
+    return Basket(lines)
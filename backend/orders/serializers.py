@@ -13,6 +13,7 @@ class OrderItemSerializer(serializers.ModelSerializer):
             "product",
             "product_title",
             "product_image",
+            "variant",
             "quantity",
             "price",
         ]
@@ -29,13 +30,9 @@ class OrderItemSerializer(serializers.ModelSerializer):
         if getattr(obj, "product_image_snapshot", None):
             return obj.product_image_snapshot
         try:
-            if hasattr(obj.product, "image_url") and obj.product.image_url:
-                return str(obj.product.image_url)
-            if hasattr(obj.product, "image") and obj.product.image:
-                return obj.product.image.url
+            return obj.product.image_url or obj.product.primary_image_url or ""
         except Exception:
-            pass
-        return ""
+            return ""
 
 
 class OrderSerializer(serializers.ModelSerializer):
@@ -66,12 +63,38 @@ class OrderSerializer(serializers.ModelSerializer):
         ]
 
 
+class OrderSummarySerializer(serializers.ModelSerializer):
+    """
+    ✅ نسخه سبک صفحه «سفارش‌های من» (?view=summary): بدون لیست آیتم‌ها؛
+    item_count و thumbnail از annotate کوئری می‌آیند.
+    """
+    status_label = serializers.ReadOnlyField()
+    item_count = serializers.IntegerField(read_only=True)
+    thumbnail = serializers.CharField(read_only=True, allow_null=True)
+
+    class Meta:
+        model = Order
+        fields = [
+            "id",
+            "tracking_number",
+            "total_price",
+            "payment_method",
+            "status",
+            "status_label",
+            "created_at",
+            "item_count",
+            "thumbnail",
+        ]
+
+
 # --------------------------
 # ورودی ثبت سفارش (Submit)
 # --------------------------
 class OrderSubmitItemSerializer(serializers.Serializer):
     product = serializers.IntegerField()
     quantity = serializers.IntegerField(min_value=1)
+    # وریانت انتخابی (رنگ و ...) - اختیاری
+    variant = serializers.IntegerField(required=False, allow_null=True)
     # اگر کلاینت قیمت هم فرستاد (اختیاری)
     price = serializers.IntegerField(required=False, min_value=0)
 
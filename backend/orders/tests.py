@@ -1,7 +1,354 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from credit.models import WalletTransaction
+from credit.wallet import credit_wallet
+from products.models import Product
+from .inventory import cancel_order
+from .models import IdempotencyKey, Order, OrderItem
+from .tracking import TrackingNumberGenerator
 
 # فعلاً تست خاصی ننوشتم؛ وقتی APIها کامل پایدار شد،
 # می‌تونیم برای submit/list/detail تست‌های کامل اضافه کنیم.
 class OrdersSmokeTest(TestCase):
     def test_ok(self):
         self.assertTrue(True)
+
+
+class CreateOrderTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("buyer", password="x")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.products = [
+            Product.objects.create(
+                title=f"p{i}", source_url=f"https://example.com/{i}", base_sale_price=1000 * (i + 1), stock=5
+            )
+            for i in range(10)
+        ]
+        self.variant = self.products[0].variants.create(name="مشکی", extra_price=500, stock=3)
+
+    def _submit(self, items, **extra):
+        return self.client.post("/api/orders/submit/", {"items": items, **extra}, format="json")
+
+    def test_constant_queries_and_snapshots(self):
+        items = [{"product": p.id, "quantity": 2, "price": 10} for p in self.products]
+        items[0]["variant"] = self.variant.id
+        # savepoint ها + محصولات + وریانت‌ها + INSERT سفارش + bulk آیتم‌ها + خواندن آیتم‌ها
+        # + یک UPDATE شرطی موجودی برای هر SKU (۱۰ تا، داخل savepoint خودش)
+        # + savepoint دور INSERT سفارش
+        with self.assertNumQueries(7 + 2 + 10 + 2):
+            res = self._submit(items, shipping_fee=100)
+        self.assertEqual(res.status_code, 201, res.data)
+
+        order = Order.objects.get(pk=res.data["id"])
+        lines = {i.product_id: i for i in order.items.all()}
+        self.assertEqual(len(lines), 10)
+        self.assertEqual(lines[self.products[0].id].price, 1500)
+        self.assertEqual(lines[self.products[0].id].variant_id, self.variant.id)
+        self.assertEqual(lines[self.products[1].id].product_title_snapshot, "p1")
+        self.assertEqual(order.total_price, 1500 * 2 + 10 * 2 * 9 + 100)
+
+    def test_missing_product_is_404(self):
+        res = self._submit([{"product": 999999, "quantity": 1}])
+        self.assertEqual(res.status_code, 404)
+        self.assertFalse(Order.objects.exists())
+
+    def test_variant_of_other_product_rejected(self):
+        res = self._submit([{"product": self.products[1].id, "quantity": 1, "variant": self.variant.id}])
+        self.assertEqual(res.status_code, 400)
+        self.assertEqual(res.data["detail"], "invalid_variant")
+
+
+class InventoryTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("buyer", password="x")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.phone = Product.objects.create(title="phone", source_url="https://example.com/phone", stock=0)
+        self.black = self.phone.variants.create(name="مشکی", stock=2)
+        self.case = Product.objects.create(title="case", source_url="https://example.com/case", stock=3)
+
+    def _submit(self, items):
+        return self.client.post("/api/orders/submit/", {"items": items}, format="json")
+
+    def _stock(self):
+        self.black.refresh_from_db()
+        self.case.refresh_from_db()
+        return self.black.stock, self.case.stock
+
+    def test_reserves_variant_and_product_stock(self):
+        res = self._submit([
+            {"product": self.phone.id, "variant": self.black.id, "quantity": 2},
+            {"product": self.case.id, "quantity": 1},
+            {"product": self.case.id, "quantity": 1},
+        ])
+        self.assertEqual(res.status_code, 201, res.data)
+        self.assertEqual(self._stock(), (0, 1))
+
+    def test_out_of_stock_rolls_back_everything(self):
+        res = self._submit([
+            {"product": self.case.id, "quantity": 1},
+            {"product": self.phone.id, "variant": self.black.id, "quantity": 3},
+        ])
+        self.assertEqual(res.status_code, 400)
+        self.assertEqual(res.data["detail"], "out_of_stock")
+        self.assertEqual(res.data["variant"], str(self.black.id))
+        self.assertEqual(self._stock(), (2, 3))
+        self.assertFalse(Order.objects.exists())
+
+    def test_cancel_releases_stock_once(self):
+        res = self._submit([{"product": self.case.id, "quantity": 2}])
+        order = Order.objects.get(pk=res.data["id"])
+        self.assertEqual(self._stock(), (2, 1))
+
+        self.assertTrue(cancel_order(order))
+        self.assertFalse(cancel_order(order))
+        self.assertEqual(self._stock(), (2, 3))
+
+        # ذخیره دوباره سفارش لغو شده موجودی را دوباره اضافه نمی‌کند
+        order.save()
+        self.assertEqual(self._stock(), (2, 3))
+
+    def test_cancel_via_save(self):
+        res = self._submit([{"product": self.case.id, "quantity": 1}])
+        order = Order.objects.get(pk=res.data["id"])
+        order.status = Order.STATUS_CANCELED
+        order.save()
+        self.assertEqual(self._stock(), (2, 3))
+
+
+    def test_cancel_legacy_order_keeps_stock(self):
+        # سفارش قدیمی که هنگام ثبت موجودی رزرو نکرده
+        order = Order.objects.create(user=self.user)
+        OrderItem.objects.create(order=order, product=self.case, quantity=2)
+        order.status = Order.STATUS_CANCELED
+        order.save()
+        order.refresh_from_db()
+        self.assertEqual(order.status, Order.STATUS_CANCELED)
+        self.assertEqual(self._stock(), (2, 3))
+
+    def test_checkout_refreshes_product_detail_cache_and_etag(self):
+        caches["products"].clear()
+        url = f"/api/products/{self.case.id}/"
+        first = self.client.get(url)
+        self.assertEqual(first.data["stock"], 3)
+        etag = first.headers["ETag"]
+        last_updated = Product.objects.get(pk=self.case.id).last_updated
+
+        with self.captureOnCommitCallbacks(execute=True):
+            res = self._submit([{"product": self.case.id, "quantity": 2}])
+        self.assertEqual(res.status_code, 201, res.data)
+        # فروش محصول را در مرتب‌سازی newest جابه‌جا نمی‌کند
+        self.assertEqual(Product.objects.get(pk=self.case.id).last_updated, last_updated)
+
+        res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.data["stock"], 1)
+        self.assertNotEqual(res.headers["ETag"], etag)
+
+    def test_variant_checkout_changes_parent_etag(self):
+        caches["products"].clear()
+        url = f"/api/products/{self.phone.id}/"
+        etag = self.client.get(url).headers["ETag"]
+
+        # خط وریانت سطر محصول والد را UPDATE نمی‌کند
+        with self.captureOnCommitCallbacks(execute=True), CaptureQueriesContext(connection) as ctx:
+            self._submit([{"product": self.phone.id, "variant": self.black.id, "quantity": 1}])
+        self.assertFalse([q for q in ctx.captured_queries if q["sql"].startswith('UPDATE "products_product"')])
+
+        res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, 200)
+        self.assertNotEqual(res.headers["ETag"], etag)
+
+
+class TrackingNumberTest(TestCase):
+    def test_unique_sortable_and_fits_column(self):
+        gen = TrackingNumberGenerator()
+        codes = [gen.next() for _ in range(5000)]
+        self.assertEqual(len(set(codes)), len(codes))
+        self.assertEqual(codes, sorted(codes))
+        self.assertTrue(all(c.startswith("TRK-") and len(c) <= 32 for c in codes))
+
+    def test_order_created_with_single_insert(self):
+        user = User.objects.create_user("buyer", password="x")
+        with self.assertNumQueries(1):
+            order = Order.objects.create(user=user)
+        self.assertTrue(order.tracking_number.startswith("TRK-"))
+        order.refresh_from_db()
+        self.assertTrue(order.tracking_number)
+
+
+class WalletCheckoutTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("buyer", password="x")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.product = Product.objects.create(
+            title="p", source_url="https://example.com/p", base_sale_price=700, stock=5
+        )
+
+    def _submit(self):
+        return self.client.post(
+            "/api/orders/submit/",
+            {"payment_method": "wallet", "items": [{"product": self.product.id, "quantity": 1, "price": 700}]},
+            format="json",
+        )
+
+    def test_wallet_payment_is_debited_and_linked(self):
+        credit_wallet(self.user, 1000, reason=WalletTransaction.REASON_REFUND)
+        res = self._submit()
+        self.assertEqual(res.status_code, 201, res.data)
+        self.assertEqual(res.data["status"], Order.STATUS_PAID)
+        tx = WalletTransaction.objects.get(reason=WalletTransaction.REASON_ORDER)
+        self.assertEqual((tx.amount, tx.balance_after, tx.reference), (-700, 300, res.data["tracking_number"]))
+
+    def test_tracking_number_collision_retries_once(self):
+        credit_wallet(self.user, 1000, reason=WalletTransaction.REASON_REFUND)
+        taken = Order.objects.create(user=self.user).tracking_number
+        with mock.patch("orders.views.new_tracking_number", side_effect=[taken, "TRK-FRESH"]):
+            res = self._submit()
+        self.assertEqual(res.status_code, 201, res.data)
+        self.assertEqual(res.data["tracking_number"], "TRK-FRESH")
+        tx = WalletTransaction.objects.get(reason=WalletTransaction.REASON_ORDER)
+        self.assertEqual(tx.reference, "TRK-FRESH")
+
+    def test_insufficient_wallet(self):
+        res = self._submit()
+        self.assertEqual(res.status_code, 400)
+        self.assertEqual(res.data["detail"], "insufficient_wallet")
+        self.assertFalse(Order.objects.exists())
+
+
+class IdempotencyTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("buyer", password="x")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.product = Product.objects.create(
+            title="p", source_url="https://example.com/p", base_sale_price=700, stock=5
+        )
+        self.body = {"items": [{"product": self.product.id, "quantity": 1}]}
+
+    def _submit(self, key, body=None):
+        return self.client.post(
+            "/api/orders/submit/", body or self.body, format="json", HTTP_IDEMPOTENCY_KEY=key
+        )
+
+    def test_retry_replays_stored_response(self):
+        first = self._submit("k1")
+        self.assertEqual(first.status_code, 201)
+        # تکرار: فقط خواندن کلید، بدون قیمت‌گذاری/رزرو/سفارش دوباره
+        with self.assertNumQueries(1):
+            again = self._submit("k1")
+        self.assertEqual(again.status_code, 201)
+        self.assertEqual(again["Idempotent-Replayed"], "true")
+        self.assertEqual(again.data["id"], first.data["id"])
+        self.assertEqual(Order.objects.count(), 1)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 4)
+
+    def test_same_key_different_body(self):
+        self._submit("k1")
+        res = self._submit("k1", {"items": [{"product": self.product.id, "quantity": 2}]})
+        self.assertEqual(res.status_code, 422)
+
+    def test_failed_request_frees_key(self):
+        self.product.stock = 0
+        self.product.save()
+        self.assertEqual(self._submit("k1").status_code, 400)
+        self.product.stock = 1
+        self.product.save()
+        self.assertEqual(self._submit("k1").status_code, 201)
+
+    def test_stale_in_progress_key_is_taken_over(self):
+        # پروسه اول وسط کار کشته شد و ردیف در جریان ماند
+        now = timezone.now()
+        IdempotencyKey.objects.create(
+            scope="orders.submit",
+            key=f"{self.user.pk}:k1",
+            request_hash="dead",
+            locked_until=now - timedelta(seconds=1),
+            expires_at=now + timedelta(hours=1),
+        )
+        res = self._submit("k1")
+        self.assertEqual(res.status_code, 201, res.data)
+        self.assertEqual(self._submit("k1")["Idempotent-Replayed"], "true")
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_live_in_progress_key_conflicts(self):
+        self._submit("k1")
+        IdempotencyKey.objects.update(response=None, locked_until=timezone.now() + timedelta(seconds=30))
+        self.assertEqual(self._submit("k1").status_code, 409)
+
+    def test_purge_expired_keys(self):
+        self._submit("k1")
+        IdempotencyKey.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        call_command("purge_idempotency_keys", stdout=StringIO())
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+
+class OrderHistoryTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("buyer", password="x")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        product = Product.objects.create(
+            title="p", source_url="https://example.com/p", image_url="https://cdn.example.com/p.jpg"
+        )
+        base = timezone.now()
+        self.orders = []
+        for i in range(5):
+            order = Order.objects.create(user=self.user, total_price=100 * i, created_at=base - timedelta(days=i))
+            for _ in range(i + 1):
+                OrderItem.objects.create(order=order, product=product, quantity=1, price=100)
+            self.orders.append(order)
+        Order.objects.create(user=User.objects.create_user("other", password="x"))
+
+    def test_items_prefetched_in_one_query(self):
+        with self.assertNumQueries(2):
+            res = self.client.get("/api/orders/")
+        self.assertEqual([o["id"] for o in res.data], [o.id for o in self.orders])
+        self.assertEqual(len(res.data[4]["items"]), 5)
+
+    def test_cursor_pagination(self):
+        res = self.client.get("/api/orders/", {"page_size": 2, "cursor": ""})
+        ids = [o["id"] for o in res.data["results"]]
+        while res.data["next_cursor"]:
+            res = self.client.get("/api/orders/", {"page_size": 2, "cursor": res.data["next_cursor"]})
+            ids += [o["id"] for o in res.data["results"]]
+        self.assertEqual(ids, [o.id for o in self.orders])
+
+    def test_summary_view(self):
+        with self.assertNumQueries(1):
+            res = self.client.get("/api/orders/", {"view": "summary"})
+        row = res.data[2]
+        self.assertNotIn("items", row)
+        self.assertEqual(row["item_count"], 3)
+        self.assertEqual(row["total_price"], 200)
+        self.assertEqual(row["thumbnail"], "https://cdn.example.com/p.jpg")
+
+    def test_full_and_summary_images_agree_for_gallery_only_product(self):
+        product = Product.objects.create(title="g", source_url="https://example.com/g")
+        Product.objects.filter(pk=product.pk).update(primary_image_url="https://cdn.example.com/g.jpg")
+        product.refresh_from_db()
+        order = Order.objects.create(user=self.user, created_at=timezone.now() + timedelta(days=1))
+        item = OrderItem.objects.create(order=order, product=product, quantity=1, price=100)
+        self.assertEqual(item.product_image_snapshot, "https://cdn.example.com/g.jpg")
+
+        # آیتم قدیمی بدون snapshot
+        OrderItem.objects.filter(pk=item.pk).update(product_image_snapshot="")
+        full = self.client.get("/api/orders/").data[0]
+        summary = self.client.get("/api/orders/", {"view": "summary"}).data[0]
+        self.assertEqual(full["items"][0]["product_image"], "https://cdn.example.com/g.jpg")
+        self.assertEqual(summary["thumbnail"], "https://cdn.example.com/g.jpg")
@@ -0,0 +1,75 @@
+import os
+import threading
+import time
+
+from django.conf import settings
+
+# ساختار شبیه snowflake (۶۳ بیت):
+#   ۴۱ بیت میلی‌ثانیه از EPOCH | ۱۰ بیت worker | ۱۲ بیت شمارنده داخل همان میلی‌ثانیه
+EPOCH_MS = 1704067200000  # 2024-01-01 UTC
+WORKER_BITS = 10
+SEQUENCE_BITS = 12
+MAX_WORKER = (1 << WORKER_BITS) - 1
+MAX_SEQUENCE = (1 << SEQUENCE_BITS) - 1
+
+# Crockford base32 (بدون I/L/O/U) - ترتیب حروف = ترتیب عددی
+_ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+# ۶۳ بیت => ۱۳ کاراکتر؛ طول ثابت تا مرتب‌سازی رشته‌ای = مرتب‌سازی زمانی
+CODE_LENGTH = 13
+PREFIX = "TRK-"
+
+
+def _worker_id() -> int:
+    """
+    ORDER_TRACKING_WORKER_ID برای هر پروسه/سرور جدا تنظیم شود (core/settings.py)؛
+    اگر نباشد از pid استفاده می‌کنیم. pid ده‌بیتی ممکن است تکراری شود؛ ستون unique
+    جلوی کد تکراری را می‌گیرد و ثبت سفارش یک بار با کد تازه تکرار می‌شود (orders.views).
+    """
+    value = getattr(settings, "ORDER_TRACKING_WORKER_ID", None)
+    if value is None:
+        value = os.getpid()
+    return int(value) & MAX_WORKER
+
+
+def _encode(n: int) -> str:
+    chars = []
+    for _ in range(CODE_LENGTH):
+        n, r = divmod(n, 32)
+        chars.append(_ALPHABET[r])
+    return "".join(reversed(chars))
+
+
+class TrackingNumberGenerator:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._last_ms = -1
+        self._sequence = 0
+
+    def next_id(self) -> int:
+        with self._lock:
+            now = int(time.time() * 1000)
+            # ساعت عقب رفت => ادامه با همان میلی‌ثانیه قبلی تا ترتیب و یکتایی حفظ شود
+            if now <= self._last_ms:
+                now = self._last_ms
+                self._sequence = (self._sequence + 1) & MAX_SEQUENCE
+                if self._sequence == 0:
+                    # شمارنده این میلی‌ثانیه پر شد
+                    now += 1
+            else:
+                self._sequence = 0
+            self._last_ms = now
+            return ((now - EPOCH_MS) << (WORKER_BITS + SEQUENCE_BITS)) | (_worker_id() << SEQUENCE_BITS) | self._sequence
+
+    def next(self) -> str:
+        return PREFIX + _encode(self.next_id())
+
+
+_generator = TrackingNumberGenerator()
+
+
+def new_tracking_number() -> str:
+    """
+    کد رهگیری یکتا و زمان‌مرتب قبل از INSERT (مثل TRK-01HV3K9Q2M7ZB)؛
+    نیازی به pk نیست پس ساخت سفارش یک INSERT است.
+    """
+    return _generator.next()
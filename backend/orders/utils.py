@@ -1,23 +1,9 @@
-from django.db import transaction
-from credit.models import Wallet
+from credit.models import WalletTransaction
+from credit.wallet import InsufficientWallet, debit_wallet  # noqa: F401 (import قبلی orders.utils)
 
 
-class InsufficientWallet(Exception):
-    def __init__(self, balance: int, need: int):
-        self.balance = int(balance)
-        self.need = int(need)
-        super().__init__("insufficient_wallet")
-
-
-@transaction.atomic
-def pay_with_wallet(user, amount: int):
-    amount = int(amount or 0)
-    wallet, _ = Wallet.objects.select_for_update().get_or_create(user=user)
-
-    balance = int(wallet.inventory or 0)
-    if balance < amount:
-        raise InsufficientWallet(balance=balance, need=amount - balance)
-
-    wallet.inventory = balance - amount
-    wallet.save(update_fields=["inventory"])
-    return wallet
+def pay_with_wallet(user, amount: int, reference: str = ""):
+    """
+    پرداخت سفارش از کیف پول؛ برداشت اتمی و ثبت در دفتر کیف پول (credit.wallet).
+    """
+    return debit_wallet(user, amount, reason=WalletTransaction.REASON_ORDER, reference=reference)
@@ -1,41 +1,23 @@
-from django.db import transaction
-from django.shortcuts import get_object_or_404
+from django.db import IntegrityError, transaction
+from django.db.models import CharField, Count, OuterRef, Prefetch, Subquery, Value, prefetch_related_objects
+from django.db.models.functions import Coalesce, NullIf
+from django.utils import timezone
 from rest_framework import generics, permissions, status
 from rest_framework.response import Response
 from rest_framework.exceptions import ValidationError
 
-from products.models import Product
+from core.pagination import KeysetPagination
+from credit.models import WalletTransaction
+
+from .idempotency import idempotent
+from .inventory import OutOfStock, reserve_stock
 from .models import Order, OrderItem
-from .serializers import OrderSerializer, OrderSubmitSerializer
+from .pricing import price_basket
+from .serializers import OrderSerializer, OrderSubmitSerializer, OrderSummarySerializer
+from .tracking import new_tracking_number
 from .utils import pay_with_wallet, InsufficientWallet
 
 
-def _get_unit_price(product: Product, fallback: int = 0) -> int:
-    """
-    تلاش می‌کنیم با هر اسم فیلدی که در Product داری قیمت را پیدا کنیم.
-    """
-    candidate_fields = [
-        "final_price",
-        "discounted_price",
-        "sale_price",
-        "price",
-        "current_price",
-        "amount",
-    ]
-    for f in candidate_fields:
-        if hasattr(product, f):
-            try:
-                v = int(getattr(product, f) or 0)
-                if v > 0:
-                    return v
-            except Exception:
-                continue
-    try:
-        return int(fallback or 0)
-    except Exception:
-        return 0
-
-
 class CreateOrderView(generics.GenericAPIView):
     """
     POST /api/my-orders/submit/
@@ -48,7 +30,7 @@ class CreateOrderView(generics.GenericAPIView):
       "shipping_fee": 30000,
       "address_id": 1,
       "address": {...},
-      "items": [{"product": 12, "quantity": 2}]
+      "items": [{"product": 12, "quantity": 2, "variant": 5}]
     }
 
     خروجی: OrderSerializer
@@ -56,6 +38,7 @@ class CreateOrderView(generics.GenericAPIView):
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = OrderSubmitSerializer
 
+    @idempotent("orders.submit")
     @transaction.atomic
     def post(self, request, *args, **kwargs):
         submit_ser = self.get_serializer(data=request.data)
@@ -79,25 +62,31 @@ class CreateOrderView(generics.GenericAPIView):
         if not items:
             raise ValidationError({"detail": "empty_cart"})
 
-        # محاسبه مبلغ از دیتابیس محصول
-        basket_lines = []
-        subtotal = 0
-        for it in items:
-            product_id = it.get("product")
-            qty = int(it.get("quantity") or 1)
-
-            product = get_object_or_404(Product, pk=product_id)
-            unit_price = _get_unit_price(product, fallback=it.get("price", 0))
-
-            subtotal += unit_price * qty
-            basket_lines.append((product, qty, unit_price))
-
-        total_payable = int(subtotal + shipping_fee)
+        # محاسبه مبلغ از دیتابیس محصول (همه خطوط با یک in_bulk)
+        basket = price_basket(items)
+        total_payable = int(basket.subtotal + shipping_fee)
+
+        # رزرو موجودی با UPDATE شرطی (بدون قفل و خواندن)؛ با خطا کل تراکنش برمی‌گردد
+        try:
+            reserve_stock(basket.stock_lines())
+        except OutOfStock as e:
+            raise ValidationError(
+                {
+                    "detail": "out_of_stock",
+                    "product": e.product_id,
+                    "variant": e.variant_id,
+                    "requested": e.requested,
+                }
+            )
 
         # پرداخت کیف پول: اول کیف پول را قفل کن و کم کن (اتمی)
+        # کد رهگیری از قبل ساخته می‌شود تا تراکنش کیف پول به سفارش ارجاع داشته باشد
+        tracking_number = new_tracking_number()
+
+        payment = None
         if is_wallet:
             try:
-                pay_with_wallet(request.user, total_payable)
+                payment = pay_with_wallet(request.user, total_payable, reference=tracking_number)
             except InsufficientWallet as e:
                 raise ValidationError(
                     {
@@ -107,33 +96,81 @@ class CreateOrderView(generics.GenericAPIView):
                     }
                 )
 
-        order = Order.objects.create(
+        order = _insert_order(
             user=request.user,
+            tracking_number=tracking_number,
             total_price=total_payable,
             shipping_fee=shipping_fee,
             payment_method=Order.PAYMENT_WALLET if is_wallet else Order.PAYMENT_DIRECT,
             status=Order.STATUS_PAID if is_wallet else Order.STATUS_PENDING,
             address=address,
+            stock_reserved_at=timezone.now(),
         )
+        if payment is not None and order.tracking_number != tracking_number:
+            # کد رهگیری عوض شد؛ ارجاع تراکنش کیف پول هم همراهش
+            WalletTransaction.objects.filter(pk=payment.pk).update(reference=order.tracking_number)
 
-        # ساخت آیتم‌ها
-        for product, qty, unit_price in basket_lines:
-            OrderItem.objects.create(
-                order=order,
-                product=product,
-                quantity=qty,
-                price=unit_price,
-            )
+        # ساخت آیتم‌ها (یک bulk_create)
+        basket.create_items(order)
+
+        # خواندن آیتم‌ها برای خروجی: یک کوئری به همراه محصول (بدون کوئری به ازای هر آیتم)
+        prefetch_related_objects([order], _items_prefetch())
 
         return Response(OrderSerializer(order).data, status=status.HTTP_201_CREATED)
 
 
+def _insert_order(**fields):
+    """
+    INSERT سفارش؛ اگر کد رهگیری تکراری بود (دو پروسه با worker id یکسان در همان
+    میلی‌ثانیه) یک بار دیگر با کد تازه تلاش می‌کند.
+    """
+    try:
+        with transaction.atomic():
+            return Order.objects.create(**fields)
+    except IntegrityError:
+        fields["tracking_number"] = new_tracking_number()
+        return Order.objects.create(**fields)
+
+
+def _items_prefetch():
+    # همه آیتم‌های همه سفارش‌های صفحه با یک کوئری (محصول برای عکس، وقتی snapshot خالی است)
+    return Prefetch("items", queryset=OrderItem.objects.select_related("product").order_by("id"))
+
+
+def _is_summary_view(request) -> bool:
+    return (request.query_params.get("view") or "").strip().lower() == "summary"
+
+
 class UserOrderListView(generics.ListAPIView):
-    serializer_class = OrderSerializer
+    """
+    تاریخچه سفارش‌ها (جدیدترین اول).
+    با ?cursor= (صفحه اول خالی، همراه ?page_size=) صفحه‌بندی keyset روی (created_at, id) فعال می‌شود؛
+    ?view=summary فقط تعداد آیتم، مبلغ و عکس اولین آیتم را می‌دهد.
+    """
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
+    keyset_ordering = ("-created_at", "-id")
 
     def get_queryset(self):
-        return Order.objects.filter(user=self.request.user).order_by("-created_at")
+        qs = Order.objects.filter(user=self.request.user).order_by(*self.keyset_ordering)
+        if not _is_summary_view(self.request):
+            return qs.prefetch_related(_items_prefetch())
+
+        first_item = OrderItem.objects.filter(order=OuterRef("pk")).order_by("id").annotate(
+            image=Coalesce(
+                NullIf("product_image_snapshot", Value("")),
+                NullIf("product__image_url", Value("")),
+                NullIf("product__primary_image_url", Value("")),
+                output_field=CharField(),
+            )
+        )
+        return qs.annotate(
+            item_count=Count("items"),
+            thumbnail=Subquery(first_item.values("image")[:1]),
+        )
+
+    def get_serializer_class(self):
+        return OrderSummarySerializer if _is_summary_view(self.request) else OrderSerializer
 
 
 class UserOrderDetailView(generics.RetrieveAPIView):
@@ -141,4 +178,4 @@ class UserOrderDetailView(generics.RetrieveAPIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        return Order.objects.filter(user=self.request.user)
+        return Order.objects.filter(user=self.request.user).prefetch_related(_items_prefetch())
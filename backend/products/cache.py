@@ -0,0 +1,102 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+# alias کش در settings.CACHES
+CACHE_ALIAS = "products"
+
+
+def _cache():
+    return caches[CACHE_ALIAS]
+
+
+def _detail_key(pk) -> str:
+    return f"product:detail:{pk}"
+
+
+def get_cached_detail(pk, request):
+    """
+    سند سریالایز شده محصول را از کش برمی‌گرداند (یا None).
+    آدرس‌های مدیا absolute هستند، پس اگر host درخواست فرق کند miss حساب می‌شود.
+    """
+    entry = _cache().get(_detail_key(pk))
+    if not entry or entry.get("host") != request.get_host():
+        return None
+    return entry
+
+
+def set_cached_detail(product, request, data):
+    """
+    ذخیره سند محصول با نسخه (id, last_updated)؛ حذف با TTL/LRU کش یا سیگنال‌ها.
+    """
+    entry = {
+        "id": product.pk,
+        "last_updated": product.last_updated,
+        "host": request.get_host(),
+        "data": data,
+    }
+    _cache().set(_detail_key(product.pk), entry)
+    return entry
+
+
+def invalidate_product(pk):
+    if pk is None:
+        return
+    _cache().delete(_detail_key(pk))
+
+
+def invalidate_all():
+    """
+    تغییراتی که روی چند محصول اثر دارند (مثلاً اسلاگ دسته) => کل کش محصولات.
+    """
+    _cache().clear()
+
+
+# ---------------------------
+# کش نتایج جستجو
+# ---------------------------
+_CATALOG_VERSION_KEY = "product:catalog_version"
+
+
+def _search_timeout() -> int:
+    return int(getattr(settings, "SEARCH_CACHE_TIMEOUT", 60))
+
+
+def _initial_version() -> int:
+    # شروع از زمان (نه ۱) تا بعد از clear/بیرون‌رفتن کلید از LRU نسخه قدیمی تکرار نشود
+    # و ETag های قبلی به اشتباه 304 نگیرند
+    return time.time_ns() // 1000
+
+
+def catalog_version() -> int:
+    return _cache().get_or_set(_CATALOG_VERSION_KEY, _initial_version, timeout=None)
+
+
+def bump_catalog_version():
+    """
+    هر تغییر محصول/اسپک/وریانت => همه نتایج جستجوی قبلی بی‌اعتبار (کلیدشان دیگر خوانده نمی‌شود).
+    """
+    try:
+        _cache().incr(_CATALOG_VERSION_KEY)
+    except ValueError:
+        _cache().set(_CATALOG_VERSION_KEY, _initial_version(), timeout=None)
+
+
+def _search_key(terms, **filters) -> str:
+    raw = " ".join(terms) + "|" + "&".join(f"{k}={v}" for k, v in sorted(filters.items()))
+    digest = hashlib.md5(raw.encode("utf-8")).hexdigest()
+    return f"product:search:{catalog_version()}:{digest}"
+
+
+def get_cached_search(terms, **filters):
+    """
+    لیست id نتایج برای کوئری نرمال‌شده (terms) و فیلترها؛ None یعنی miss.
+    """
+    return _cache().get(_search_key(terms, **filters))
+
+
+def set_cached_search(terms, ids, **filters):
+    # فقط id ها؛ سریالایز هر بار از روی ردیف‌های تازه انجام می‌شود
+    _cache().set(_search_key(terms, **filters), list(ids), timeout=_search_timeout())
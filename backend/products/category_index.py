@@ -0,0 +1,93 @@
+import hashlib
+import time
+from typing import Dict, FrozenSet, List, Optional
+
+from .lazy_index import LazyIndex
+from .models import Category
+
+
+class CategoryIndex:
+    """
+    ایندکس درختی دسته‌بندی‌ها که با یک کوئری ساخته می‌شود:
+    - nodes: id -> {"id", "title", "slug", "parent"}
+    - slug_to_id: slug -> id
+    - paths: id -> مسیر materialized (Category.path)
+    - descendants: id -> مجموعه id خودش و همه زیرشاخه‌ها
+    - tree / flat: خروجی آماده برای CategoryTreeApi / CategoryFlat
+    - version: اثر انگشت کل ردیف‌ها (برای ETag)
+    """
+
+    def __init__(self, rows):
+        self.loaded_at = time.monotonic()
+        self.nodes: Dict[int, dict] = {}
+        self.slug_to_id: Dict[str, int] = {}
+        self.paths: Dict[int, str] = {}
+        children: Dict[Optional[int], List[int]] = {}
+
+        for row in sorted(rows, key=lambda r: r["id"]):
+            node = {
+                "id": row["id"],
+                "title": row["title"],
+                "slug": row["slug"],
+                "parent": row["parent_id"],
+            }
+            self.nodes[node["id"]] = node
+            self.slug_to_id[node["slug"]] = node["id"]
+            self.paths[node["id"]] = row.get("path") or ""
+            children.setdefault(node["parent"], []).append(node["id"])
+
+        self.children = children
+        self.version = hashlib.md5(
+            repr([(n["id"], n["title"], n["slug"], n["parent"], self.paths[n["id"]]) for n in self.nodes.values()]).encode("utf-8")
+        ).hexdigest()
+        self.descendants: Dict[int, FrozenSet[int]] = {}
+        for node_id in self.nodes:
+            self.descendants[node_id] = frozenset(self._walk(node_id))
+
+        self.flat = [dict(n) for n in self.nodes.values()]
+        self.tree = [self._render(root_id, set()) for root_id in children.get(None, [])]
+
+    def _walk(self, root_id: int):
+        # پیمایش تکراری (بدون بازگشت) با محافظت در برابر حلقه
+        seen = {root_id}
+        stack = [root_id]
+        while stack:
+            node_id = stack.pop()
+            for child_id in self.children.get(node_id, []):
+                if child_id not in seen:
+                    seen.add(child_id)
+                    stack.append(child_id)
+        return seen
+
+    def _render(self, node_id: int, path: set) -> dict:
+        path = path | {node_id}
+        data = dict(self.nodes[node_id])
+        data["children"] = [
+            self._render(child_id, path)
+            for child_id in self.children.get(node_id, [])
+            if child_id not in path
+        ]
+        return data
+
+    def get_by_slug(self, slug: str) -> Optional[dict]:
+        node_id = self.slug_to_id.get(slug)
+        return self.nodes.get(node_id) if node_id is not None else None
+
+    def descendant_ids(self, category_id: int) -> FrozenSet[int]:
+        return self.descendants.get(category_id, frozenset())
+
+
+def _build() -> CategoryIndex:
+    return CategoryIndex(Category.objects.values("id", "title", "slug", "parent_id", "path"))
+
+
+# سقف عمر ایندکس؛ برای رسیدن تغییرات پروسه‌های دیگر (invalidation فقط محلی است)
+_categories: LazyIndex[CategoryIndex] = LazyIndex(_build, "CATEGORY_INDEX_MAX_AGE", 60)
+
+
+def get_category_index() -> CategoryIndex:
+    return _categories.get()
+
+
+def invalidate_category_index():
+    _categories.invalidate()
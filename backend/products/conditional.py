@@ -0,0 +1,39 @@
+import hashlib
+from functools import wraps
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+
+def make_etag(*parts) -> str:
+    raw = "|".join(str(p) for p in parts)
+    return '"%s"' % hashlib.md5(raw.encode("utf-8")).hexdigest()
+
+
+def conditional_get(method):
+    """
+    دکوریتور get برای ویوهای کاتالوگ:
+    self.get_validators(request, ...) => (etag, last_modified)
+    اگر If-None-Match / If-Modified-Since بخورد، 304 برمی‌گردد و ویو/سریالایزر اجرا نمی‌شود.
+    """
+
+    @wraps(method)
+    def wrapper(self, request, *args, **kwargs):
+        etag, last_modified = self.get_validators(request, *args, **kwargs)
+        if etag is None and last_modified is None:
+            return method(self, request, *args, **kwargs)
+
+        ts = int(last_modified.timestamp()) if last_modified else None
+        early = get_conditional_response(request, etag=etag, last_modified=ts)
+        if early is not None:
+            return early
+
+        response = method(self, request, *args, **kwargs)
+        if response.status_code == 200:
+            if etag:
+                response.headers["ETag"] = etag
+            if ts is not None:
+                response.headers["Last-Modified"] = http_date(ts)
+        return response
+
+    return wrapper
@@ -0,0 +1,157 @@
+import threading
+import time
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from .lazy_index import LazyIndex
+from .models import ProductSpecification, ProductVariant
+from .text import normalize_text
+
+# facet رنگ از نام وریانت‌ها ساخته می‌شود
+COLOR_FACET = "رنگ"
+# مقادیر طولانی (توضیح آزاد) facet حساب نمی‌شوند
+MAX_VALUE_LENGTH = 40
+# سقف تعداد مقدار برگشتی برای هر facet
+MAX_VALUES_PER_FACET = 20
+
+FacetPair = Tuple[str, str]
+
+
+class FacetIndex:
+    """
+    posting list های facet:
+    - postings: (facet, value) نرمال‌شده -> مجموعه id محصولات
+    - product_pairs: id محصول -> (facet, value) هایش (برای شمارش و حذف افزایشی)
+    facet ها از ProductSpecification(name, value) و رنگ وریانت‌ها می‌آیند.
+    """
+
+    def __init__(self):
+        self.loaded_at = time.monotonic()
+        self.postings: Dict[FacetPair, Set[int]] = {}
+        self.product_pairs: Dict[int, Set[FacetPair]] = {}
+        self.facet_labels: Dict[str, str] = {}
+        self.value_labels: Dict[FacetPair, str] = {}
+        self._lock = threading.RLock()
+
+    @classmethod
+    def build(cls) -> "FacetIndex":
+        index = cls()
+        for pid, pairs in _load_pairs().items():
+            index._set_product(pid, pairs)
+        return index
+
+    def _set_product(self, pid: int, labelled_pairs: Iterable[Tuple[str, str]]):
+        for pair in self.product_pairs.pop(pid, set()):
+            docs = self.postings.get(pair)
+            if docs is not None:
+                docs.discard(pid)
+                if not docs:
+                    del self.postings[pair]
+
+        pairs = set()
+        for name, value in labelled_pairs:
+            pair = (normalize_text(name), normalize_text(value))
+            if not pair[0] or not pair[1]:
+                continue
+            self.facet_labels.setdefault(pair[0], name.strip())
+            self.value_labels.setdefault(pair, value.strip())
+            self.postings.setdefault(pair, set()).add(pid)
+            pairs.add(pair)
+        if pairs:
+            self.product_pairs[pid] = pairs
+
+    def update_product(self, pid: int):
+        pairs = _load_pairs([pid]).get(pid, [])
+        with self._lock:
+            self._set_product(pid, pairs)
+
+    # ---------------------------
+    # فیلتر و شمارش
+    # ---------------------------
+    def filter_ids(self, selected: Dict[str, Set[str]]) -> Set[int]:
+        """
+        مقادیر یک facet با هم OR و facet های مختلف با هم AND می‌شوند.
+        """
+        result: Optional[Set[int]] = None
+        with self._lock:
+            for facet, values in selected.items():
+                ids = set()
+                for value in values:
+                    ids |= self.postings.get((facet, value), set())
+                result = ids if result is None else result & ids
+                if not result:
+                    return set()
+        return result or set()
+
+    def counts(self, product_ids: Iterable[int]) -> List[dict]:
+        """
+        شمارش مقدار هر facet برای مجموعه نتیجه فعلی، از روی posting ها.
+        """
+        counter: Counter = Counter()
+        with self._lock:
+            for pid in product_ids:
+                counter.update(self.product_pairs.get(pid, ()))
+
+            facets: Dict[str, List[Tuple[int, FacetPair]]] = {}
+            for pair, count in counter.items():
+                facets.setdefault(pair[0], []).append((count, pair))
+
+            out = []
+            for facet, items in facets.items():
+                items.sort(key=lambda item: (-item[0], item[1][1]))
+                out.append({
+                    "key": facet,
+                    "name": self.facet_labels.get(facet, facet),
+                    "values": [
+                        {"value": self.value_labels.get(pair, pair[1]), "count": count}
+                        for count, pair in items[:MAX_VALUES_PER_FACET]
+                    ],
+                })
+        out.sort(key=lambda f: (-sum(v["count"] for v in f["values"]), f["key"]))
+        return out
+
+
+def parse_facet_params(values: Iterable[str]) -> Dict[str, Set[str]]:
+    """
+    ?facet=رم:8GB&facet=برند:Samsung => {"رم": {"8gb"}, "برند": {"samsung"}}
+    """
+    selected: Dict[str, Set[str]] = {}
+    for raw in values:
+        name, sep, value = (raw or "").partition(":")
+        name, value = normalize_text(name), normalize_text(value)
+        if sep and name and value:
+            selected.setdefault(name, set()).add(value)
+    return selected
+
+
+def _load_pairs(product_ids=None) -> Dict[int, List[Tuple[str, str]]]:
+    specs = ProductSpecification.objects.all()
+    variants = ProductVariant.objects.all()
+    if product_ids is not None:
+        specs = specs.filter(product_id__in=product_ids)
+        variants = variants.filter(product_id__in=product_ids)
+
+    pairs: Dict[int, List[Tuple[str, str]]] = {}
+    for pid, name, value in specs.values_list("product_id", "name", "value").iterator():
+        if value and len(value) <= MAX_VALUE_LENGTH:
+            pairs.setdefault(pid, []).append((name, value))
+    for pid, name in variants.values_list("product_id", "name").iterator():
+        pairs.setdefault(pid, []).append((COLOR_FACET, name))
+    return pairs
+
+
+_facets: LazyIndex[FacetIndex] = LazyIndex(FacetIndex.build, "FACET_INDEX_MAX_AGE", 600)
+
+
+def get_facet_index() -> FacetIndex:
+    return _facets.get()
+
+
+def refresh_product_facets(product_id: int):
+    index = _facets.current
+    if index is not None and product_id is not None:
+        index.update_product(product_id)
+
+
+def invalidate_facet_index():
+    _facets.invalidate()
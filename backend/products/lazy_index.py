@@ -0,0 +1,50 @@
+import threading
+import time
+from typing import Callable, Generic, Optional, TypeVar
+
+from django.conf import settings
+
+T = TypeVar("T")
+
+
+class LazyIndex(Generic[T]):
+    """
+    نگه‌دارنده ایندکس درون‌حافظه‌ای هر پروسه (دسته‌ها، جستجو، facet، پیشنهاد):
+    - ساخت تنبل در اولین get و ساخت دوباره وقتی عمرش از settings.<setting_name> گذشت
+    - فقط یک thread می‌سازد؛ بقیه تا آماده شدن منتظر همان قفل می‌مانند
+    - invalidate => ساخت دوباره در get بعدی
+    ایندکس ساخته‌شده باید loaded_at (time.monotonic) داشته باشد.
+    """
+
+    def __init__(self, builder: Callable[[], T], setting_name: str, default_age: float):
+        self._builder = builder
+        self._setting_name = setting_name
+        self._default_age = default_age
+        self._lock = threading.Lock()
+        self._index: Optional[T] = None
+
+    def max_age(self) -> float:
+        return float(getattr(settings, self._setting_name, self._default_age))
+
+    def _fresh(self, index) -> bool:
+        return index is not None and time.monotonic() - index.loaded_at < self.max_age()
+
+    def get(self) -> T:
+        index = self._index
+        if self._fresh(index):
+            return index
+
+        with self._lock:
+            index = self._index
+            if not self._fresh(index):
+                index = self._builder()
+                self._index = index
+        return index
+
+    @property
+    def current(self) -> Optional[T]:
+        # ایندکس ساخته‌شده (بدون ساختن)؛ به‌روزرسانی افزایشی فقط وقتی ایندکسی هست
+        return self._index
+
+    def invalidate(self):
+        self._index = None
@@ -0,0 +1,59 @@
+from django.core.management.base import BaseCommand
+
+from products.models import Product, ProductMedia
+
+
+class Command(BaseCommand):
+    help = 'پر کردن primary_image_url / primary_media_id برای محصولات موجود'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='تعداد ردیف در هر bulk_update')
+
+    def handle(self, *args, **options):
+        batch_size = max(1, options['batch_size'])
+
+        # ۱) اولین مدیای هر محصول (primary اول، بعد order/id) با یک پیمایش روی جدول مدیا
+        first_media = {}
+        media_qs = (
+            ProductMedia.objects.only('id', 'product_id', 'file', 'is_primary', 'order')
+            .order_by('product_id', '-is_primary', 'order', 'id')
+        )
+        for m in media_qs.iterator(chunk_size=2000):
+            if m.product_id in first_media or not m.file:
+                continue
+            try:
+                first_media[m.product_id] = (m.file.url, m.id)
+            except Exception:
+                continue
+
+        # ۲) محصولات را تکه‌تکه بخوان و فقط ردیف‌های تغییرکرده را bulk_update کن
+        changed = []
+        updated = 0
+        products = Product.objects.only('id', 'main_image_file', 'primary_image_url', 'primary_media_id')
+        for product in products.iterator(chunk_size=batch_size):
+            url, media_id = '', None
+            if product.main_image_file:
+                try:
+                    url = product.main_image_file.url
+                except Exception:
+                    url = ''
+            if not url and product.id in first_media:
+                url, media_id = first_media[product.id]
+            url = url[:500]
+
+            if url == product.primary_image_url and media_id == product.primary_media_id:
+                continue
+            product.primary_image_url = url
+            product.primary_media_id = media_id
+            changed.append(product)
+
+            if len(changed) >= batch_size:
+                Product.objects.bulk_update(changed, ['primary_image_url', 'primary_media_id'])
+                updated += len(changed)
+                changed = []
+
+        if changed:
+            Product.objects.bulk_update(changed, ['primary_image_url', 'primary_media_id'])
+            updated += len(changed)
+
+        self.stdout.write(self.style.SUCCESS(f'عکس اصلی {updated} محصول به‌روز شد.'))
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.27 on 2026-10-17 22:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['-last_updated', '-id'], name='product_updated_id_idx'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.27 on 2026-10-17 22:26
+
+from django.db import migrations, models
+
+
+def fill_category_paths(apps, schema_editor):
+    Category = apps.get_model("products", "Category")
+    rows = list(Category.objects.values_list("id", "parent_id"))
+    children = {}
+    for cat_id, parent_id in rows:
+        children.setdefault(parent_id, []).append(cat_id)
+
+    paths = {}
+    stack = [(cat_id, "/") for cat_id in children.get(None, [])]
+    while stack:
+        cat_id, prefix = stack.pop()
+        if cat_id in paths:
+            continue
+        paths[cat_id] = f"{prefix}{cat_id}/"
+        stack.extend((child_id, paths[cat_id]) for child_id in children.get(cat_id, []))
+
+    objs = [Category(id=cat_id, path=path) for cat_id, path in paths.items()]
+    Category.objects.bulk_update(objs, ["path"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0003_product_primary_image'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='path',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=255),
+        ),
+        migrations.RunPython(fill_category_paths, migrations.RunPython.noop),
+    ]
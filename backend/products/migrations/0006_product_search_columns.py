@@ -0,0 +1,71 @@
+# Generated by Django 4.2.27 on 2026-10-17 22:31
+
+import re
+
+from django.db import migrations, models
+
+# کپی ثابت products.text.normalize_text در زمان این migration؛ تغییرات بعدی نرمال‌ساز
+# (یا credit.serializers) migration های قدیمی را عوض نکند/نشکند
+_DIGITS = str.maketrans("۰۱۲۳۴۵۶۷۸۹٠١٢٣٤٥٦٧٨٩", "01234567890123456789")
+_CHAR_MAP = str.maketrans({
+    "ي": "ی",
+    "ى": "ی",
+    "ئ": "ی",
+    "ك": "ک",
+    "ة": "ه",
+    "ۀ": "ه",
+    "أ": "ا",
+    "إ": "ا",
+    "آ": "ا",
+    "ٱ": "ا",
+    "ؤ": "و",
+})
+_DIACRITICS_RE = re.compile("[\u064b-\u065f\u0670\u0640]")
+_ZW_RE = re.compile("[\u200c\u200d\u200e\u200f\u00ad\ufeff]")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def normalize_text(value) -> str:
+    if value is None:
+        return ""
+    v = str(value).strip().translate(_DIGITS)
+    v = v.translate(_CHAR_MAP)
+    v = _DIACRITICS_RE.sub("", v)
+    v = _ZW_RE.sub(" ", v)
+    v = v.lower()
+    return _SPACE_RE.sub(" ", v).strip()
+
+
+def fill_search_columns(apps, schema_editor):
+    Product = apps.get_model("products", "Product")
+    batch = []
+    for product in Product.objects.only("id", "title", "description").iterator(chunk_size=500):
+        product.search_title = normalize_text(product.title)[:255]
+        product.search_text = normalize_text(f"{product.title or ''} {product.description or ''}")
+        batch.append(product)
+        if len(batch) >= 500:
+            Product.objects.bulk_update(batch, ["search_title", "search_text"])
+            batch = []
+    if batch:
+        Product.objects.bulk_update(batch, ["search_title", "search_text"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0005_product_sort_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='search_text',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='search_title',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=255),
+        ),
+        migrations.RunPython(fill_search_columns, migrations.RunPython.noop),
+    ]
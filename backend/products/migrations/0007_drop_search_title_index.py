@@ -0,0 +1,18 @@
+# Generated by Django 4.2.27 on 2026-10-17 22:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0006_product_search_columns'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='product',
+            name='search_title',
+            field=models.CharField(blank=True, default='', editable=False, max_length=255),
+        ),
+    ]
@@ -1,6 +1,25 @@
+from django.core.exceptions import ValidationError
 from django.db import models
+from django.db.models import F, Func, OuterRef, Subquery, Value
+from django.db.models.functions import Concat, Substr
 from django.utils.text import slugify
 
+from .text import normalize_text
+
+
+class CategoryQuerySet(models.QuerySet):
+    def with_product_counts(self):
+        """
+        تعداد محصولات هر دسته (با احتساب همه زیرشاخه‌ها) در یک کوئری SQL.
+        """
+        counts = (
+            Product.objects.filter(category__path__startswith=OuterRef("path"))
+            .order_by()
+            .annotate(c=Func(F("id"), function="COUNT"))
+            .values("c")
+        )
+        return self.annotate(product_count=Subquery(counts, output_field=models.IntegerField()))
+
 
 class Category(models.Model):
     title = models.CharField(max_length=255)
@@ -13,15 +32,58 @@ class Category(models.Model):
         related_name="children",
     )
 
+    # ✅ مسیر materialized: "/1/5/9/" (id همه اجداد + خودش)
+    # زیردرخت یک دسته = path__startswith=category.path (یک کوئری ایندکس‌دار)
+    path = models.CharField(max_length=255, blank=True, default="", db_index=True, editable=False)
+
+    objects = CategoryQuerySet.as_manager()
+
     class Meta:
         verbose_name = "دسته‌بندی"
         verbose_name_plural = "دسته‌بندی‌ها"
 
+    def _creates_cycle(self) -> bool:
+        if not (self.pk and self.parent_id):
+            return False
+        if self.parent_id == self.pk:
+            return True
+        parent_path = Category.objects.filter(pk=self.parent_id).values_list("path", flat=True).first() or ""
+        return f"/{self.pk}/" in parent_path
+
+    def clean(self):
+        super().clean()
+        if self._creates_cycle():
+            raise ValidationError({"parent": "دسته نمی‌تواند زیرشاخه خودش باشد."})
+
+    def _build_path(self) -> str:
+        if not self.parent_id:
+            return f"/{self.pk}/"
+        parent_path = Category.objects.filter(pk=self.parent_id).values_list("path", flat=True).first()
+        return f"{parent_path or f'/{self.parent_id}/'}{self.pk}/"
+
     def save(self, *args, **kwargs):
         if not self.slug and self.title:
             self.slug = slugify(self.title, allow_unicode=True)
+        if self._creates_cycle():
+            raise ValueError("category cannot be moved under its own subtree")
+        # مسیر فعلی از دیتابیس (نمونه در حافظه ممکن است کهنه باشد)
+        old_path = ""
+        if self.pk:
+            old_path = Category.objects.filter(pk=self.pk).values_list("path", flat=True).first() or ""
         super().save(*args, **kwargs)
 
+        new_path = self._build_path()
+        if new_path == old_path:
+            return
+
+        self.path = new_path
+        Category.objects.filter(pk=self.pk).update(path=new_path)
+        if old_path:
+            # جابجایی (re-parent): مسیر کل زیردرخت با یک UPDATE عوض می‌شود
+            Category.objects.filter(path__startswith=old_path).exclude(pk=self.pk).update(
+                path=Concat(Value(new_path), Substr("path", len(old_path) + 1))
+            )
+
     def __str__(self):
         return self.title
 
@@ -30,6 +92,10 @@ class Product(models.Model):
     title = models.CharField(max_length=255)
     description = models.TextField(null=True, blank=True)
 
+    # ✅ متن نرمال‌شده برای جستجو (products/text.py) - در save (و در نتیجه ایمپورت‌ها) پر می‌شود
+    search_title = models.CharField(max_length=255, blank=True, default="", editable=False)
+    search_text = models.TextField(blank=True, default="", editable=False)
+
     # ✅ قبلی بود (ولی توی فایل شما خراب شده بود) - نگه داشتیم و درستش کردیم
     category = models.ForeignKey(
         Category,
@@ -54,13 +120,77 @@ class Product(models.Model):
 
     last_updated = models.DateTimeField(auto_now=True)
 
+    # ✅ عکس اصلیِ resolve شده (denormalized) تا لیست‌ها کوئری media نزنند
+    # با save محصول و save/delete مدیا به‌روز می‌شود؛ برای داده‌های قدیمی: backfill_main_images
+    primary_image_url = models.CharField(max_length=500, blank=True, default="", editable=False)
+    primary_media_id = models.BigIntegerField(null=True, blank=True, editable=False)
+
     class Meta:
         verbose_name = "محصول"
         verbose_name_plural = "محصولات"
+        indexes = [
+            # ✅ برای صفحه‌بندی keyset روی (last_updated, id)
+            models.Index(fields=["-last_updated", "-id"], name="product_updated_id_idx"),
+            # ✅ مرتب‌سازی/فیلتر قیمت و جدیدترین داخل یک دسته = range scan روی ایندکس
+            models.Index(fields=["base_sale_price", "id"], name="product_price_id_idx"),
+            models.Index(fields=["category", "base_sale_price", "id"], name="product_cat_price_idx"),
+            models.Index(fields=["category", "-last_updated", "-id"], name="product_cat_updated_idx"),
+        ]
 
     def __str__(self):
         return self.title
 
+    def fill_search_fields(self):
+        self.search_title = normalize_text(self.title)[:255]
+        self.search_text = normalize_text(f"{self.title or ''} {self.description or ''}")
+
+    def save(self, *args, **kwargs):
+        self.fill_search_fields()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and {"title", "description"} & set(update_fields):
+            kwargs["update_fields"] = set(update_fields) | {"search_title", "search_text"}
+
+        creating = self._state.adding
+        super().save(*args, **kwargs)
+        # محصول تازه بدون عکس آپلودی هنوز مدیایی ندارد
+        if creating and not self.main_image_file:
+            return
+        # بعد از save، اسم نهایی فایل آپلودی مشخص است
+        self.refresh_primary_image()
+
+    def resolve_primary_image(self):
+        """
+        (url, media_id) عکس اصلی:
+        1) main_image_file
+        2) media که primary هست
+        3) اولین media بر اساس order
+        """
+        if self.main_image_file:
+            try:
+                return self.main_image_file.url, None
+            except Exception:
+                pass
+
+        if self.pk:
+            media = self.media.order_by("-is_primary", "order", "id").first()
+            if media and media.file:
+                try:
+                    return media.file.url, media.id
+                except Exception:
+                    pass
+
+        return "", None
+
+    def refresh_primary_image(self):
+        url, media_id = self.resolve_primary_image()
+        url = (url or "")[:500]
+        if url == self.primary_image_url and media_id == self.primary_media_id:
+            return
+        self.primary_image_url = url
+        self.primary_media_id = media_id
+        # update مستقیم تا save/سیگنال دوباره اجرا نشود
+        Product.objects.filter(pk=self.pk).update(primary_image_url=url, primary_media_id=media_id)
+
     @property
     def main_image(self):
         """
@@ -68,7 +198,7 @@ class Product(models.Model):
         اولویت:
         1) main_image_file
         2) image_url
-        3) اولین media که primary هست
+        3) عکس resolve شده از media (primary_image_url)
         4) None
         """
         if self.main_image_file:
@@ -80,21 +210,7 @@ class Product(models.Model):
         if self.image_url:
             return self.image_url
 
-        primary = self.media.filter(is_primary=True).first()
-        if primary:
-            try:
-                return primary.file.url
-            except Exception:
-                return None
-
-        any_media = self.media.first()
-        if any_media:
-            try:
-                return any_media.file.url
-            except Exception:
-                return None
-
-        return None
+        return self.primary_image_url or None
 
 
 class ProductSpecification(models.Model):
@@ -0,0 +1,194 @@
+import bisect
+import math
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional
+
+from .lazy_index import LazyIndex
+from .models import Product, ProductSpecification, ProductVariant
+from .text import tokenize, tokenize_normalized
+
+# پارامترهای BM25
+K1 = 1.2
+B = 0.75
+# وزن تکرار یک کلمه در عنوان نسبت به بقیه متن
+TITLE_BOOST = 3.0
+# کلمه‌ای که فقط با پیشوند پیدا شده (تایپ ناتمام) کمی امتیاز کمتری دارد
+PREFIX_WEIGHT = 0.7
+# سقف تعداد کلمات واژگان که یک پیشوند به آن‌ها باز می‌شود
+MAX_PREFIX_EXPANSION = 50
+
+
+class SearchIndex:
+    """
+    ایندکس معکوس (inverted index) محصولات با رتبه‌بندی BM25:
+    - postings: term -> {product_id: tf وزن‌دار (عنوان × TITLE_BOOST + بقیه)}
+    - متن هر محصول: عنوان، توضیحات، نام/مقدار اسپک‌ها و نام وریانت‌ها
+      (عنوان/توضیحات از ستون‌های نرمال‌شده search_title/search_text خوانده می‌شوند)
+    - همه کلمات کوئری باید پیدا شوند (مثل قبل)؛ کلمه می‌تواند پیشوند باشد.
+    """
+
+    def __init__(self):
+        self.loaded_at = time.monotonic()
+        self.postings: Dict[str, Dict[int, float]] = {}
+        self.doc_len: Dict[int, float] = {}
+        self.doc_terms: Dict[int, List[str]] = {}
+        self.total_len = 0.0
+        self._vocab: Optional[List[str]] = None
+        self._lock = threading.RLock()
+
+    # ---------------------------
+    # ساخت / به‌روزرسانی
+    # ---------------------------
+    @classmethod
+    def build(cls, product_ids=None) -> "SearchIndex":
+        index = cls()
+        for product_id, title, text, extra in _load_documents(product_ids):
+            index._add(product_id, title, text, extra)
+        return index
+
+    def _add(self, product_id: int, title: str, text: str, extra: str):
+        """
+        title و text از قبل نرمال شده‌اند (search_text خودش عنوان را هم دارد)؛
+        extra (اسپک/وریانت) خام است.
+        """
+        tf = Counter()
+        for term in tokenize_normalized(title):
+            tf[term] += TITLE_BOOST
+        for term in tokenize_normalized(text):
+            tf[term] += 1.0
+        for term in tokenize(extra):
+            tf[term] += 1.0
+
+        for term, weight in tf.items():
+            self.postings.setdefault(term, {})[product_id] = weight
+        length = sum(tf.values())
+        self.doc_len[product_id] = length
+        self.doc_terms[product_id] = list(tf.keys())
+        self.total_len += length
+        self._vocab = None
+
+    def _remove(self, product_id: int):
+        for term in self.doc_terms.pop(product_id, []):
+            docs = self.postings.get(term)
+            if docs is None:
+                continue
+            docs.pop(product_id, None)
+            if not docs:
+                del self.postings[term]
+        self.total_len -= self.doc_len.pop(product_id, 0.0)
+        self._vocab = None
+
+    def update(self, product_id: int):
+        docs = list(_load_documents([product_id]))
+        with self._lock:
+            self._remove(product_id)
+            for doc in docs:
+                self._add(*doc)
+
+    def remove(self, product_id: int):
+        with self._lock:
+            self._remove(product_id)
+
+    # ---------------------------
+    # جستجو
+    # ---------------------------
+    def _expand(self, token: str) -> Dict[str, float]:
+        """
+        کلمه دقیق با وزن ۱ و کلمات هم‌پیشوند با PREFIX_WEIGHT.
+        """
+        if self._vocab is None:
+            self._vocab = sorted(self.postings)
+        terms = {}
+        if token in self.postings:
+            terms[token] = 1.0
+        i = bisect.bisect_left(self._vocab, token)
+        while i < len(self._vocab) and len(terms) < MAX_PREFIX_EXPANSION:
+            term = self._vocab[i]
+            if not term.startswith(token):
+                break
+            terms.setdefault(term, PREFIX_WEIGHT)
+            i += 1
+        return terms
+
+    def search(self, query: str, limit: int = 6) -> List[int]:
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens:
+            return []
+
+        with self._lock:
+            n_docs = len(self.doc_len)
+            if not n_docs:
+                return []
+            avg_len = self.total_len / n_docs
+
+            scores: Optional[Dict[int, float]] = None
+            for token in tokens:
+                token_scores: Dict[int, float] = {}
+                for term, term_weight in self._expand(token).items():
+                    docs = self.postings[term]
+                    idf = math.log(1 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+                    for pid, tf in docs.items():
+                        norm = K1 * (1 - B + B * self.doc_len[pid] / avg_len)
+                        s = term_weight * idf * tf * (K1 + 1) / (tf + norm)
+                        # هر کلمه کوئری فقط با بهترین تطابقش حساب می‌شود
+                        if s > token_scores.get(pid, 0.0):
+                            token_scores[pid] = s
+
+                if scores is None:
+                    scores = token_scores
+                else:
+                    scores = {pid: s + token_scores[pid] for pid, s in scores.items() if pid in token_scores}
+                if not scores:
+                    return []
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], -item[0]))
+        return [pid for pid, _ in ranked[:limit]]
+
+
+def _load_documents(product_ids=None):
+    """
+    (id، عنوان نرمال، متن نرمال، متن اسپک/وریانت) با سه کوئری (محصول، اسپک، وریانت).
+    """
+    products = Product.objects.all()
+    specs = ProductSpecification.objects.all()
+    variants = ProductVariant.objects.all()
+    if product_ids is not None:
+        products = products.filter(id__in=product_ids)
+        specs = specs.filter(product_id__in=product_ids)
+        variants = variants.filter(product_id__in=product_ids)
+
+    extra: Dict[int, List[str]] = {}
+    for pid, name, value in specs.values_list("product_id", "name", "value").iterator():
+        extra.setdefault(pid, []).extend((name, value))
+    for pid, name in variants.values_list("product_id", "name").iterator():
+        extra.setdefault(pid, []).append(name)
+
+    for pid, title, text in products.values_list("id", "search_title", "search_text").iterator():
+        yield pid, title or "", text or "", " ".join(extra.get(pid, []))
+
+
+# سقف عمر ایندکس؛ به‌روزرسانی‌های افزایشی فقط در همین پروسه اعمال می‌شوند
+_search: LazyIndex[SearchIndex] = LazyIndex(SearchIndex.build, "SEARCH_INDEX_MAX_AGE", 600)
+
+
+def get_search_index() -> SearchIndex:
+    return _search.get()
+
+
+def reindex_product(product_id: int):
+    # اگر ایندکس هنوز ساخته نشده، ساخت بعدی همه چیز را می‌خواند
+    index = _search.current
+    if index is not None and product_id is not None:
+        index.update(product_id)
+
+
+def unindex_product(product_id: int):
+    index = _search.current
+    if index is not None and product_id is not None:
+        index.remove(product_id)
+
+
+def invalidate_search_index():
+    _search.invalidate()
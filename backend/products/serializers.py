@@ -3,7 +3,6 @@ from typing import Optional
 from rest_framework import serializers
 
 from .models import (
-    Category,
     Product,
     ProductSpecification,
     ProductMedia,
@@ -25,35 +24,6 @@ def _abs_url(request, url: Optional[str]) -> Optional[str]:
     return request.build_absolute_uri(u)
 
 
-# ---------------------------
-# Category
-# ---------------------------
-class CategoryFlatSerializer(serializers.ModelSerializer):
-    parent = serializers.IntegerField(source="parent_id", read_only=True)
-
-    class Meta:
-        model = Category
-        fields = ["id", "title", "slug", "parent"]
-
-
-class CategoryTreeSerializer(serializers.ModelSerializer):
-    parent = serializers.IntegerField(source="parent_id", read_only=True)
-    children = serializers.SerializerMethodField()
-
-    class Meta:
-        model = Category
-        fields = ["id", "title", "slug", "parent", "children"]
-
-    def get_children(self, obj):
-        # اگر related_name=children باشه
-        if hasattr(obj, "children"):
-            qs = obj.children.all().order_by("id")
-        else:
-            # fallback (اگر parent داشته باشی)
-            qs = Category.objects.filter(parent=obj).order_by("id")
-        return CategoryTreeSerializer(qs, many=True, context=self.context).data
-
-
 # ---------------------------
 # Product - Specs
 # ---------------------------
@@ -247,37 +217,8 @@ class ProductSerializer(serializers.ModelSerializer):
             return None
 
     def _pick_main_image_url(self, obj) -> Optional[str]:
-        # 1) اگر فیلد مستقیم داشت
-        for attr in ["main_image_file", "main_image", "image", "thumbnail", "file"]:
-            if hasattr(obj, attr):
-                f = getattr(obj, attr, None)
-                try:
-                    if f and hasattr(f, "url"):
-                        return f.url
-                except Exception:
-                    pass
-
-        # 2) primary media
-        try:
-            primary = obj.media.filter(is_primary=True).order_by("order", "id").first()
-            if primary:
-                f = getattr(primary, "file", None)
-                if f:
-                    return f.url
-        except Exception:
-            pass
-
-        # 3) first media
-        try:
-            first = obj.media.order_by("order", "id").first()
-            if first:
-                f = getattr(first, "file", None)
-                if f:
-                    return f.url
-        except Exception:
-            pass
-
-        return None
+        # ✅ از ستون denormalized خوانده می‌شود (Product.primary_image_url)؛ بدون کوئری media
+        return getattr(obj, "primary_image_url", None) or None
 
     def get_main_image(self, obj):
         request = self.context.get("request")
@@ -286,3 +227,39 @@ class ProductSerializer(serializers.ModelSerializer):
     def get_image_url(self, obj):
         request = self.context.get("request")
         return _abs_url(request, self._pick_main_image_url(obj))
+
+
+# ---------------------------
+# Product - Card (grid)
+# ---------------------------
+class ProductCardSerializer(serializers.ModelSerializer):
+    """
+    ✅ نسخه سبک برای صفحات گرید (?view=card):
+    فقط عنوان، قیمت، عکس اصلی و اسلاگ دسته.
+    specs/variants/media لود نمی‌شوند؛ عکس اصلی از ستون primary_image_url می‌آید.
+    """
+    category_slug = serializers.SerializerMethodField()
+    main_image = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Product
+        fields = [
+            "id",
+            "title",
+            "base_sale_price",
+            "category_slug",
+            "main_image",
+        ]
+
+    def get_category_slug(self, obj):
+        try:
+            return obj.category.slug if obj.category else None
+        except Exception:
+            return None
+
+    def _pick_main_image_url(self, obj) -> Optional[str]:
+        return getattr(obj, "primary_image_url", None) or None
+
+    def get_main_image(self, obj):
+        request = self.context.get("request")
+        return _abs_url(request, self._pick_main_image_url(obj))
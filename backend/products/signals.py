@@ -0,0 +1,111 @@
+from django.db import transaction
+from django.db.models import Value
+from django.db.models.functions import Concat, Substr
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .cache import bump_catalog_version, invalidate_all, invalidate_product
+from .category_index import invalidate_category_index
+from .models import (
+    Category,
+    Product,
+    ProductMedia,
+    ProductSpecification,
+    ProductVariant,
+)
+from .facets import refresh_product_facets
+from .search import reindex_product, unindex_product
+from .suggest import refresh_category_suggestions, refresh_product_suggestions
+
+
+# ---------------------------
+# داده‌های مشتق روی خود مدل‌ها (قبل از کش/ایندکس ثبت می‌شوند)
+# ---------------------------
+@receiver(post_save, sender=ProductMedia)
+@receiver(post_delete, sender=ProductMedia)
+def refresh_product_primary_image(sender, instance: ProductMedia, **kwargs):
+    """
+    هر تغییری در مدیا => عکس اصلی ذخیره‌شده روی محصول دوباره حساب می‌شود.
+    (در حذف cascade خود محصول، ردیفی پیدا نمی‌شود و کاری انجام نمی‌دهیم)
+    """
+    product = Product.objects.filter(pk=instance.product_id).first()
+    if product:
+        product.refresh_primary_image()
+
+
+@receiver(post_delete, sender=Category)
+def reroot_category_subtree(sender, instance: Category, **kwargs):
+    """
+    parent با SET_NULL پاک می‌شود؛ زیرشاخه‌ها ریشه می‌شوند و پیشوند مسیرشان حذف می‌شود.
+    """
+    if not instance.path:
+        return
+    Category.objects.filter(path__startswith=instance.path).update(
+        path=Concat(Value("/"), Substr("path", len(instance.path) + 1))
+    )
+
+
+# ---------------------------
+# کش و ایندکس‌ها
+# ---------------------------
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_product_cache(sender, instance: Product, **kwargs):
+    invalidate_product(instance.pk)
+
+
+@receiver(post_save, sender=Product)
+def reindex_product_on_save(sender, instance: Product, **kwargs):
+    pk = instance.pk
+    transaction.on_commit(lambda: reindex_product(pk))
+    transaction.on_commit(lambda: refresh_product_suggestions(pk))
+    transaction.on_commit(bump_catalog_version)
+
+
+@receiver(post_delete, sender=Product)
+def unindex_product_on_delete(sender, instance: Product, **kwargs):
+    pk = instance.pk
+    transaction.on_commit(lambda: unindex_product(pk))
+    transaction.on_commit(lambda: refresh_product_suggestions(pk))
+    transaction.on_commit(lambda: refresh_product_facets(pk))
+    transaction.on_commit(bump_catalog_version)
+
+
+@receiver(post_save, sender=ProductSpecification)
+@receiver(post_delete, sender=ProductSpecification)
+@receiver(post_save, sender=ProductVariant)
+@receiver(post_delete, sender=ProductVariant)
+@receiver(post_save, sender=ProductMedia)
+@receiver(post_delete, sender=ProductMedia)
+def touch_product_from_child(sender, instance, **kwargs):
+    # last_updated محصول و نسخه کاتالوگ جلو می‌روند تا ETag جزئیات و لیست‌ها عوض شوند
+    Product.objects.filter(pk=instance.product_id).update(last_updated=timezone.now())
+    invalidate_product(instance.product_id)
+    transaction.on_commit(bump_catalog_version)
+
+
+@receiver(post_save, sender=ProductSpecification)
+@receiver(post_delete, sender=ProductSpecification)
+@receiver(post_save, sender=ProductVariant)
+@receiver(post_delete, sender=ProductVariant)
+def reindex_product_from_child(sender, instance, **kwargs):
+    product_id = instance.product_id
+    transaction.on_commit(lambda: reindex_product(product_id))
+    transaction.on_commit(lambda: refresh_product_facets(product_id))
+
+
+@receiver(post_save, sender=ProductSpecification)
+@receiver(post_delete, sender=ProductSpecification)
+def refresh_brand_suggestions(sender, instance, **kwargs):
+    product_id = instance.product_id
+    transaction.on_commit(lambda: refresh_product_suggestions(product_id))
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_product_cache_from_category(sender, instance: Category, **kwargs):
+    invalidate_category_index()
+    invalidate_all()
+    pk = instance.pk
+    transaction.on_commit(lambda: refresh_category_suggestions(pk))
@@ -0,0 +1,204 @@
+import bisect
+import threading
+import time
+from typing import Dict, List, Set, Tuple
+
+from .lazy_index import LazyIndex
+from .models import Category, Product, ProductSpecification
+from .text import normalize_text, tokenize
+
+# نام اسپک‌هایی که مقدارشان برند حساب می‌شود (نرمال‌شده)
+BRAND_SPEC_NAMES = {normalize_text(n) for n in ("برند", "brand", "سازنده", "شرکت سازنده")}
+
+# عنوان محصول از شروع چند کلمه اول هم قابل پیشنهاد است ("پرو مکس" => "آیفون ۱۶ پرو مکس")
+MAX_TITLE_OFFSETS = 6
+
+# ترتیب نمایش نوع‌ها
+KIND_PRIORITY = {"category": 0, "brand": 1, "product": 2}
+
+# (کلید نرمال‌شده، نوع، شناسه، متن نمایشی)
+Entry = Tuple[str, str, str, str]
+
+
+class SuggestIndex:
+    """
+    آرایه مرتب از پیشوندها برای autocomplete (به جای trie؛ همان پیچیدگی با bisect):
+    - عنوان محصولات (از ابتدای هر کلمه)، برندها (از اسپک‌ها) و عنوان دسته‌ها
+    - جستجو: bisect روی کلید نرمال‌شده و پیمایش بازه هم‌پیشوند؛ بدون دیتابیس
+    - به‌روزرسانی افزایشی با insort / حذف دقیق
+    """
+
+    def __init__(self):
+        self.loaded_at = time.monotonic()
+        self.entries: List[Entry] = []
+        self.by_source: Dict[Tuple[str, int], List[Entry]] = {}
+        # برند => محصولاتی که این برند را دارند (یک entry برای هر برند)
+        self.brand_refs: Dict[str, Set[int]] = {}
+        self.brand_labels: Dict[str, str] = {}
+        self.product_brands: Dict[int, Set[str]] = {}
+        self._lock = threading.RLock()
+        # ساخت کامل: entry ها فقط append می‌شوند و آخر کار یک بار sort
+        self._bulk = False
+
+    @classmethod
+    def build(cls) -> "SuggestIndex":
+        index = cls()
+        brands = _load_brands()
+        # insort برای هر entry در ساخت کامل O(n²) است؛ append + یک sort => O(n log n)
+        index._bulk = True
+        for pid, title in Product.objects.values_list("id", "title").iterator():
+            index._set_product(pid, title, brands.get(pid, []))
+        for cid, title, slug in Category.objects.values_list("id", "title", "slug"):
+            index._set_category(cid, title, slug)
+        index.entries = sorted(set(index.entries))
+        index._bulk = False
+        return index
+
+    # ---------------------------
+    # entry ها
+    # ---------------------------
+    def _insert(self, entry: Entry):
+        if self._bulk:
+            self.entries.append(entry)
+            return
+        i = bisect.bisect_left(self.entries, entry)
+        if i < len(self.entries) and self.entries[i] == entry:
+            return
+        self.entries.insert(i, entry)
+
+    def _delete(self, entry: Entry):
+        i = bisect.bisect_left(self.entries, entry)
+        if i < len(self.entries) and self.entries[i] == entry:
+            del self.entries[i]
+
+    def _drop_source(self, source):
+        for entry in self.by_source.pop(source, []):
+            self._delete(entry)
+
+    def _set_product(self, pid: int, title: str, brands: List[str]):
+        self._drop_source(("product", pid))
+        tokens = tokenize(title)
+        entries = []
+        for offset in range(min(len(tokens), MAX_TITLE_OFFSETS)):
+            entry = (" ".join(tokens[offset:]), "product", str(pid), title)
+            self._insert(entry)
+            entries.append(entry)
+        if entries:
+            self.by_source[("product", pid)] = entries
+
+        # برندها با شمارنده ارجاع
+        new_brands = {}
+        for label in brands:
+            key = normalize_text(label)
+            if key:
+                new_brands.setdefault(key, label)
+        old_brands = self.product_brands.pop(pid, set())
+        for key in old_brands - set(new_brands):
+            refs = self.brand_refs.get(key, set())
+            refs.discard(pid)
+            if not refs:
+                self.brand_refs.pop(key, None)
+                self._delete((key, "brand", key, self.brand_labels.pop(key, key)))
+        for key, label in new_brands.items():
+            refs = self.brand_refs.setdefault(key, set())
+            if not refs:
+                self.brand_labels[key] = label
+                self._insert((key, "brand", key, label))
+            refs.add(pid)
+        if new_brands:
+            self.product_brands[pid] = set(new_brands)
+
+    def _set_category(self, cid: int, title: str, slug: str):
+        self._drop_source(("category", cid))
+        key = normalize_text(title)
+        if key:
+            entry = (key, "category", slug or str(cid), title)
+            self._insert(entry)
+            self.by_source[("category", cid)] = [entry]
+
+    # ---------------------------
+    # API افزایشی
+    # ---------------------------
+    def update_product(self, pid: int):
+        title = Product.objects.filter(pk=pid).values_list("title", flat=True).first()
+        brands = _load_brands([pid]).get(pid, [])
+        with self._lock:
+            if title is None:
+                self._set_product(pid, "", [])
+            else:
+                self._set_product(pid, title, brands)
+
+    def update_category(self, cid: int):
+        row = Category.objects.filter(pk=cid).values_list("title", "slug").first()
+        with self._lock:
+            if row is None:
+                self._drop_source(("category", cid))
+            else:
+                self._set_category(cid, *row)
+
+    # ---------------------------
+    # جستجو
+    # ---------------------------
+    def suggest(self, query: str, limit: int = 8) -> List[dict]:
+        prefix = normalize_text(query)
+        if not prefix:
+            return []
+
+        seen = set()
+        found = []
+        with self._lock:
+            i = bisect.bisect_left(self.entries, (prefix,))
+            # کمی بیشتر از limit جمع می‌کنیم تا بعد بر اساس نوع مرتب شود
+            while i < len(self.entries) and len(found) < limit * 4:
+                key, kind, ref, label = self.entries[i]
+                if not key.startswith(prefix):
+                    break
+                if (kind, ref) not in seen:
+                    seen.add((kind, ref))
+                    found.append((KIND_PRIORITY[kind], len(label), kind, ref, label))
+                i += 1
+
+        found.sort()
+        out = []
+        for _, _, kind, ref, label in found[:limit]:
+            item = {"text": label, "type": kind}
+            if kind == "product":
+                item["id"] = int(ref)
+            elif kind == "category":
+                item["slug"] = ref
+            out.append(item)
+        return out
+
+
+def _load_brands(product_ids=None) -> Dict[int, List[str]]:
+    specs = ProductSpecification.objects.all()
+    if product_ids is not None:
+        specs = specs.filter(product_id__in=product_ids)
+    brands: Dict[int, List[str]] = {}
+    for pid, name, value in specs.values_list("product_id", "name", "value").iterator():
+        if normalize_text(name) in BRAND_SPEC_NAMES and value:
+            brands.setdefault(pid, []).append(value)
+    return brands
+
+
+_suggest: LazyIndex[SuggestIndex] = LazyIndex(SuggestIndex.build, "SUGGEST_INDEX_MAX_AGE", 600)
+
+
+def get_suggest_index() -> SuggestIndex:
+    return _suggest.get()
+
+
+def refresh_product_suggestions(product_id: int):
+    index = _suggest.current
+    if index is not None and product_id is not None:
+        index.update_product(product_id)
+
+
+def refresh_category_suggestions(category_id: int):
+    index = _suggest.current
+    if index is not None and category_id is not None:
+        index.update_category(category_id)
+
+
+def invalidate_suggest_index():
+    _suggest.invalidate()
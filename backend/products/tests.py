@@ -1,3 +1,541 @@
-from django.test import TestCase
+import time
+from types import SimpleNamespace
 
-# Create your tests here.
+from django.core.cache import caches
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from .category_index import get_category_index, invalidate_category_index
+from .facets import invalidate_facet_index
+from .lazy_index import LazyIndex
+from .models import Category, Product, ProductMedia
+from .search import get_search_index, invalidate_search_index
+from .suggest import SuggestIndex, get_suggest_index, invalidate_suggest_index
+
+TEST_STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.InMemoryStorage"},
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+}
+
+
+def make_product(title, category=None, **kwargs):
+    kwargs.setdefault("source_url", f"https://example.com/{title}")
+    return Product.objects.create(title=title, category=category, **kwargs)
+
+
+class ProductListPaginationTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.category = Category.objects.create(title="mobile", slug="mobile")
+        self.products = [make_product(f"p{i}", self.category) for i in range(5)]
+
+    def test_without_params_returns_plain_list(self):
+        res = self.client.get("/api/products/")
+        self.assertEqual(res.status_code, 200)
+        self.assertIsInstance(res.data, list)
+        self.assertEqual(len(res.data), 5)
+
+    def test_frontend_page_params_keep_plain_list(self):
+        # درخواست دقیق InfiniteProducts.tsx؛ فقط آرایه ساده را قبول می‌کند
+        res = self.client.get("/api/products/", {"page": 1, "page_size": 2})
+        self.assertEqual(res.status_code, 200)
+        self.assertIsInstance(res.data, list)
+        self.assertEqual(len(res.data), 5)
+
+    def test_cursor_walks_every_product_once(self):
+        seen = []
+        res = self.client.get("/api/products/", {"page_size": 2, "cursor": ""})
+        while True:
+            self.assertEqual(res.status_code, 200)
+            seen.extend(p["id"] for p in res.data["results"])
+            if not res.data["next_cursor"]:
+                break
+            res = self.client.get(
+                "/api/products/", {"page_size": 2, "cursor": res.data["next_cursor"]}
+            )
+
+        expected = [p.id for p in sorted(self.products, key=lambda p: (p.last_updated, p.id), reverse=True)]
+        self.assertEqual(seen, expected)
+
+    def test_page_size_is_capped(self):
+        res = self.client.get("/api/products/", {"page_size": 10_000, "cursor": ""})
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(len(res.data["results"]), 5)
+        self.assertIsNone(res.data["next"])
+
+    def test_invalid_cursor(self):
+        res = self.client.get("/api/products/", {"cursor": "not-a-cursor"})
+        self.assertEqual(res.status_code, 404)
+
+
+class ProductCardViewTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.category = Category.objects.create(title="laptop", slug="laptop")
+        for i in range(4):
+            p = make_product(f"card{i}", self.category, base_sale_price=1000 + i)
+            p.specs.create(name="RAM", value="8GB")
+            p.variants.create(name=f"black{i}")
+
+    def test_card_fields_only(self):
+        res = self.client.get("/api/products/", {"view": "card"})
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(
+            set(res.data[0].keys()),
+            {"id", "title", "base_sale_price", "category_slug", "main_image"},
+        )
+        self.assertEqual(res.data[0]["category_slug"], "laptop")
+
+    def test_card_query_count_is_constant(self):
+        get_category_index()
+        # فقط محصول و دسته (ETag بدون کوئری؛ media/specs/variants لود نمی‌شوند)
+        with self.assertNumQueries(1):
+            self.client.get("/api/products/", {"view": "card"})
+
+    def test_category_detail_card(self):
+        res = self.client.get("/api/categories/laptop/", {"view": "card"})
+        self.assertEqual(res.status_code, 200)
+        self.assertNotIn("specs", res.data["products"][0])
+
+
+@override_settings(STORAGES=TEST_STORAGES, MEDIA_URL="/media/")
+class PrimaryImageTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.product = make_product("watch")
+
+    def test_media_hooks_keep_primary_image(self):
+        first = ProductMedia.objects.create(product=self.product, file="product_media/a.jpg", order=1)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.primary_media_id, first.id)
+        self.assertEqual(self.product.primary_image_url, "/media/product_media/a.jpg")
+
+        primary = ProductMedia.objects.create(
+            product=self.product, file="product_media/b.jpg", order=2, is_primary=True
+        )
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.primary_media_id, primary.id)
+
+        primary.delete()
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.primary_media_id, first.id)
+
+        first.delete()
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.primary_image_url, "")
+        self.assertIsNone(self.product.primary_media_id)
+
+    def test_list_has_no_per_row_media_queries(self):
+        for i in range(3):
+            p = make_product(f"w{i}")
+            ProductMedia.objects.create(product=p, file=f"product_media/{i}.jpg")
+        get_category_index()
+        with self.assertNumQueries(4):  # products + media + specs + variants
+            res = self.client.get("/api/products/")
+        self.assertTrue(res.data[0]["main_image"].endswith(".jpg"))
+
+    def test_backfill_command(self):
+        ProductMedia.objects.create(product=self.product, file="product_media/c.jpg")
+        Product.objects.update(primary_image_url="", primary_media_id=None)
+        call_command("backfill_main_images", stdout=open("/dev/null", "w"))
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.primary_image_url, "/media/product_media/c.jpg")
+
+
+class ProductDetailCacheTest(TestCase):
+    def setUp(self):
+        caches["products"].clear()
+        self.client = APIClient()
+        self.product = make_product("console")
+
+    def test_second_hit_skips_database(self):
+        url = f"/api/products/{self.product.id}/"
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            res = self.client.get(url)
+        self.assertEqual(res.data["title"], "console")
+
+    def test_child_change_invalidates(self):
+        url = f"/api/products/{self.product.id}/"
+        self.client.get(url)
+        self.product.specs.create(name="RAM", value="16GB")
+        res = self.client.get(url)
+        self.assertEqual(res.data["specs"][0]["value"], "16GB")
+
+    def test_missing_product_is_404(self):
+        res = self.client.get("/api/products/999999/")
+        self.assertEqual(res.status_code, 404)
+
+
+class CategoryIndexTest(TestCase):
+    def setUp(self):
+        invalidate_category_index()
+        self.client = APIClient()
+        self.root = Category.objects.create(title="digital", slug="digital")
+        self.child = Category.objects.create(title="mobile", slug="mobile", parent=self.root)
+        self.leaf = Category.objects.create(title="android", slug="android", parent=self.child)
+        self.other = Category.objects.create(title="home", slug="home")
+        make_product("phone", self.leaf)
+        make_product("sofa", self.other)
+
+    def test_tree_is_one_query(self):
+        with self.assertNumQueries(1):
+            res = self.client.get("/api/categories/")
+        self.assertEqual([c["slug"] for c in res.data], ["digital", "home"])
+        self.assertEqual(res.data[0]["children"][0]["children"][0]["slug"], "android")
+
+    def test_descendant_filter(self):
+        res = self.client.get("/api/products/", {"category_slug": "digital"})
+        self.assertEqual([p["title"] for p in res.data], ["phone"])
+
+        res = self.client.get("/api/categories/digital/")
+        self.assertEqual(res.data["category"]["parent"], None)
+        self.assertEqual([p["title"] for p in res.data["products"]], ["phone"])
+
+    def test_save_invalidates(self):
+        self.client.get("/api/categories/flat/")
+        Category.objects.create(title="ios", slug="ios", parent=self.child)
+        res = self.client.get("/api/categories/flat/")
+        self.assertIn("ios", [c["slug"] for c in res.data])
+
+
+class CategoryPathTest(TestCase):
+    def setUp(self):
+        self.a = Category.objects.create(title="a", slug="a")
+        self.b = Category.objects.create(title="b", slug="b", parent=self.a)
+        self.c = Category.objects.create(title="c", slug="c", parent=self.b)
+        self.z = Category.objects.create(title="z", slug="z")
+
+    def _path(self, cat):
+        return Category.objects.get(pk=cat.pk).path
+
+    def test_paths_on_create(self):
+        self.assertEqual(self._path(self.c), f"/{self.a.id}/{self.b.id}/{self.c.id}/")
+
+    def test_reparent_moves_subtree(self):
+        self.b.parent = self.z
+        self.b.save()
+        self.assertEqual(self._path(self.c), f"/{self.z.id}/{self.b.id}/{self.c.id}/")
+
+    def test_cannot_move_under_own_subtree(self):
+        self.a.parent = self.c
+        with self.assertRaises(ValueError):
+            self.a.save()
+
+    def test_delete_reroots_children(self):
+        self.a.delete()
+        self.assertEqual(self._path(self.c), f"/{self.b.id}/{self.c.id}/")
+
+    def test_subtree_product_counts(self):
+        make_product("x", self.c)
+        make_product("y", self.b)
+        make_product("w", self.z)
+        counts = dict(Category.objects.with_product_counts().values_list("slug", "product_count"))
+        self.assertEqual(counts, {"a": 2, "b": 2, "c": 1, "z": 1})
+
+    def test_subtree_filter_is_single_query(self):
+        invalidate_category_index()
+        make_product("x", self.c)
+        client = APIClient()
+        client.get("/api/categories/flat/")  # گرم کردن ایندکس
+        with self.assertNumQueries(1):  # فقط لیست
+            res = client.get("/api/products/", {"category_slug": "a", "view": "card"})
+        self.assertEqual([p["title"] for p in res.data], ["x"])
+
+
+class ConditionalGetTest(TestCase):
+    def setUp(self):
+        caches["products"].clear()
+        invalidate_category_index()
+        self.client = APIClient()
+        self.category = Category.objects.create(title="audio", slug="audio")
+        self.product = make_product("speaker", self.category)
+
+    def _revalidate(self, url):
+        first = self.client.get(url)
+        self.assertEqual(first.status_code, 200)
+        self.assertIn("ETag", first.headers)
+        return first.headers["ETag"]
+
+    def test_not_modified_for_catalog_endpoints(self):
+        for url in [
+            "/api/products/",
+            f"/api/products/{self.product.id}/",
+            "/api/categories/",
+            "/api/categories/audio/",
+        ]:
+            etag = self._revalidate(url)
+            res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(res.status_code, 304, url)
+
+    def test_child_change_changes_etag(self):
+        url = f"/api/products/{self.product.id}/"
+        etag = self._revalidate(url)
+        self.product.variants.create(name="red")
+        res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, 200)
+        self.assertNotEqual(res.headers["ETag"], etag)
+
+    def test_list_etag_without_scope_query(self):
+        # صفحه cursor هم هزینه ثابت دارد: ETag بدون aggregate روی کل محصولات
+        get_category_index()
+        with self.assertNumQueries(1):
+            res = self.client.get("/api/products/", {"cursor": "", "page_size": 1, "view": "card"})
+        etag = res.headers["ETag"]
+        with self.assertNumQueries(0):
+            res = self.client.get("/api/products/", {"cursor": "", "page_size": 1, "view": "card"}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, 304)
+
+    def test_catalog_change_changes_list_etag(self):
+        etag = self._revalidate("/api/categories/audio/")
+        with self.captureOnCommitCallbacks(execute=True):
+            ProductMedia.objects.create(product=self.product, file="product_media/x.jpg")
+        res = self.client.get("/api/categories/audio/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, 200)
+
+    def test_query_string_is_part_of_etag(self):
+        etag = self._revalidate("/api/products/")
+        res = self.client.get("/api/products/", {"view": "card"}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, 200)
+
+
+class ProductSearchTest(TestCase):
+    def setUp(self):
+        invalidate_search_index()
+        caches["products"].clear()
+        self.client = APIClient()
+        self.iphone = make_product("گوشی آیفون ۱۶ پرو مکس", description="اپل")
+        self.case = make_product("قاب گوشی", description="مناسب آيفون 16")
+        self.samsung = make_product("گوشی سامسونگ", description="اندروید")
+        self.samsung.specs.create(name="برند", value="Samsung")
+
+    def _titles(self, q, **params):
+        res = self.client.get("/api/products/search/", {"q": q, **params})
+        self.assertEqual(res.status_code, 200)
+        return [p["title"] for p in res.data]
+
+    def test_title_match_ranks_first(self):
+        self.assertEqual(self._titles("آیفون 16"), [self.iphone.title, self.case.title])
+
+    def test_persian_normalization_and_prefix(self):
+        # ي عربی، ارقام فارسی و کلمه ناتمام
+        self.assertEqual(self._titles("ايفون ۱۶")[0], self.iphone.title)
+        self.assertEqual(self._titles("سامس"), [self.samsung.title])
+
+    def test_specs_are_indexed(self):
+        self.assertEqual(self._titles("samsung"), [self.samsung.title])
+
+    def test_all_words_required(self):
+        self.assertEqual(self._titles("آیفون اندروید"), [])
+
+    def test_incremental_update(self):
+        get_search_index()
+        with self.captureOnCommitCallbacks(execute=True):
+            p = make_product("کنسول پلی استیشن")
+        self.assertEqual(self._titles("پلی"), [p.title])
+        with self.captureOnCommitCallbacks(execute=True):
+            p.delete()
+        self.assertEqual(self._titles("پلی"), [])
+
+    def test_head_query_served_from_result_cache(self):
+        self._titles("آیفون", view="card")
+        invalidate_search_index()
+        # کلید روی کوئری نرمال‌شده است؛ ایندکس دوباره ساخته نمی‌شود و فقط ردیف‌ها خوانده می‌شوند
+        with self.assertNumQueries(1):
+            titles = self._titles("  آيفون ", view="card")
+        self.assertEqual(titles, [self.iphone.title, self.case.title])
+
+
+class ProductSuggestTest(TestCase):
+    def setUp(self):
+        invalidate_suggest_index()
+        self.client = APIClient()
+        self.category = Category.objects.create(title="گوشی موبایل", slug="mobile")
+        self.product = make_product("گوشی سامسونگ گلکسی A55", self.category)
+        self.product.specs.create(name="برند", value="Samsung")
+        make_product("قاب سامسونگ").specs.create(name="brand", value="samsung")
+
+    def _suggest(self, q):
+        res = self.client.get("/api/products/suggest/", {"q": q})
+        self.assertEqual(res.status_code, 200)
+        return res.data
+
+    def test_prefix_without_database(self):
+        get_suggest_index()
+        with self.assertNumQueries(0):
+            data = self._suggest("گوش")
+        self.assertEqual(data[0], {"text": "گوشی موبایل", "type": "category", "slug": "mobile"})
+        self.assertIn(self.product.id, [d.get("id") for d in data])
+
+    def test_mid_title_and_brand_dedup(self):
+        self.assertEqual(self._suggest("گلکس")[0]["id"], self.product.id)
+        brands = [d for d in self._suggest("sam") if d["type"] == "brand"]
+        self.assertEqual(len(brands), 1)
+
+    def test_incremental_rebuild(self):
+        get_suggest_index()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.title = "گوشی شیائومی"
+            self.product.save()
+        self.assertEqual(self._suggest("گلکس"), [])
+        self.assertEqual(self._suggest("شیا")[0]["id"], self.product.id)
+
+
+    def test_full_build_matches_incremental(self):
+        Product.objects.bulk_create(
+            Product(title=f"گوشی مدل {i} پرو", source_url=f"https://example.com/bulk/{i}") for i in range(3000)
+        )
+        index = get_suggest_index()
+        # ۴ پیشوند برای هر محصول انبوه + ۴ و ۲ برای محصولات setUp + یک برند + یک دسته
+        self.assertEqual(len(index.entries), 3000 * 4 + 4 + 2 + 1 + 1)
+        self.assertEqual(index.entries, sorted(index.entries))
+
+        # همان نتیجه با insort افزایشی (مسیر update_product)
+        incremental = SuggestIndex()
+        for entry in index.entries:
+            incremental._insert(entry)
+        self.assertEqual(incremental.entries, index.entries)
+        self.assertEqual(self._suggest("مدل 2999")[0]["text"], "گوشی مدل 2999 پرو")
+
+
+class ProductFacetTest(TestCase):
+    def setUp(self):
+        invalidate_facet_index()
+        invalidate_category_index()
+        self.client = APIClient()
+        self.category = Category.objects.create(title="mobile", slug="mobile")
+        self.a = make_product("a", self.category)
+        self.b = make_product("b", self.category)
+        self.c = make_product("c")
+        for p, ram, brand in [(self.a, "8GB", "Samsung"), (self.b, "12GB", "Samsung"), (self.c, "8GB", "Xiaomi")]:
+            p.specs.create(name="RAM", value=ram)
+            p.specs.create(name="برند", value=brand)
+        self.a.variants.create(name="مشکی")
+        self.b.specs.create(name="توضیحات", value="x" * 100)
+
+    def _ids(self, data):
+        return sorted(p["id"] for p in data)
+
+    def test_filter_and_counts(self):
+        res = self.client.get("/api/products/", {"facet": ["ram:8gb"], "facets": "1"})
+        self.assertEqual(self._ids(res.data["results"]), sorted([self.a.id, self.c.id]))
+        facets = {f["name"]: {v["value"]: v["count"] for v in f["values"]} for f in res.data["facets"]}
+        self.assertEqual(facets["برند"], {"Samsung": 1, "Xiaomi": 1})
+        self.assertEqual(facets["رنگ"], {"مشکی": 1})
+        self.assertNotIn("توضیحات", facets)
+
+    def test_values_or_facets_and(self):
+        res = self.client.get("/api/products/", {"facet": ["RAM:8GB", "RAM:12GB", "برند:samsung"]})
+        self.assertEqual(self._ids(res.data), sorted([self.a.id, self.b.id]))
+
+    def test_category_facets(self):
+        res = self.client.get("/api/categories/mobile/", {"facets": "1"})
+        facets = {f["name"]: {v["value"]: v["count"] for v in f["values"]} for f in res.data["facets"]}
+        self.assertEqual(facets["RAM"], {"12GB": 1, "8GB": 1})
+
+    def test_paginated_facets(self):
+        res = self.client.get("/api/products/", {"page_size": 1, "cursor": "", "facets": "1"})
+        self.assertEqual(len(res.data["results"]), 1)
+        ram = next(f for f in res.data["facets"] if f["name"] == "RAM")
+        self.assertEqual(sum(v["count"] for v in ram["values"]), 3)
+
+
+class ProductOrderingTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.category = Category.objects.create(title="tv", slug="tv")
+        self.prices = [300, 100, 500, 200, 400]
+        for i, price in enumerate(self.prices):
+            make_product(f"tv{i}", self.category, base_sale_price=price)
+
+    def _prices(self, **params):
+        res = self.client.get("/api/products/", params)
+        self.assertEqual(res.status_code, 200)
+        return [p["base_sale_price"] for p in res.data]
+
+    def test_price_ordering(self):
+        self.assertEqual(self._prices(ordering="price"), sorted(self.prices))
+        self.assertEqual(self._prices(ordering="-price"), sorted(self.prices, reverse=True))
+
+    def test_price_range(self):
+        self.assertEqual(self._prices(ordering="price", min_price=200, max_price=400), [200, 300, 400])
+        self.assertEqual(len(self._prices(min_price="abc")), 5)
+
+    def test_keyset_pages_follow_price_ordering(self):
+        seen = []
+        params = {"ordering": "price", "page_size": 2, "cursor": "", "category": self.category.id}
+        res = self.client.get("/api/products/", params)
+        while True:
+            seen.extend(p["base_sale_price"] for p in res.data["results"])
+            if not res.data["next_cursor"]:
+                break
+            res = self.client.get("/api/products/", {**params, "cursor": res.data["next_cursor"]})
+        self.assertEqual(seen, sorted(self.prices))
+
+    def test_cursor_from_other_ordering_is_rejected(self):
+        res = self.client.get("/api/products/", {"page_size": 2, "cursor": ""})
+        res = self.client.get("/api/products/", {"ordering": "price", "cursor": res.data["next_cursor"]})
+        self.assertEqual(res.status_code, 404)
+
+
+class SearchColumnsTest(TestCase):
+    def test_columns_are_normalized_on_save(self):
+        p = make_product("گوشي آیفون‌۱۶ Pro", description="رنگِ مشكي")
+        self.assertEqual(p.search_title, "گوشی ایفون 16 pro")
+        self.assertEqual(p.search_text, "گوشی ایفون 16 pro رنگ مشکی")
+
+        p.title = "iPad"
+        p.save(update_fields=["title"])
+        p.refresh_from_db()
+        self.assertEqual(p.search_title, "ipad")
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class ProductBatchTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.products = [make_product(f"p{i}") for i in range(10)]
+        for p in self.products:
+            p.specs.create(name="رم", value="8GB")
+            p.variants.create(name="مشکی", stock=1)
+
+    def test_preserves_order_and_skips_missing(self):
+        a, b = self.products[3], self.products[1]
+        res = self.client.get("/api/products/batch/", {"ids": f"{a.id},999999,{b.id},x,{a.id}"})
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual([p["id"] for p in res.data], [a.id, b.id])
+
+    def test_fixed_query_count(self):
+        ids = ",".join(str(p.id) for p in self.products)
+        # محصول+دسته، media، specs، variants
+        with self.assertNumQueries(4):
+            res = self.client.get("/api/products/batch/", {"ids": ids})
+        self.assertEqual(len(res.data), 10)
+        with self.assertNumQueries(1):
+            self.client.get("/api/products/batch/", {"ids": ids, "view": "card"})
+
+    def test_too_many_ids(self):
+        ids = ",".join(str(i) for i in range(1, 102))
+        self.assertEqual(self.client.get("/api/products/batch/", {"ids": ids}).status_code, 400)
+
+
+class LazyIndexTest(TestCase):
+    def test_builds_once_until_stale_or_invalidated(self):
+        builds = []
+
+        def build():
+            index = SimpleNamespace(loaded_at=time.monotonic())
+            builds.append(index)
+            return index
+
+        holder = LazyIndex(build, "TEST_LAZY_INDEX_MAX_AGE", 600)
+        self.assertIsNone(holder.current)
+        self.assertIs(holder.get(), holder.get())
+        self.assertEqual(len(builds), 1)
+
+        holder.invalidate()
+        holder.get()
+        with self.settings(TEST_LAZY_INDEX_MAX_AGE=0):
+            holder.get()
+        self.assertEqual(len(builds), 3)
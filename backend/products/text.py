@@ -0,0 +1,52 @@
+import re
+from typing import List
+
+from credit.serializers import normalize_digits
+
+# عربی => فارسی و یکسان‌سازی حروف هم‌شکل
+_CHAR_MAP = str.maketrans({
+    "ي": "ی",
+    "ى": "ی",
+    "ئ": "ی",
+    "ك": "ک",
+    "ة": "ه",
+    "ۀ": "ه",
+    "أ": "ا",
+    "إ": "ا",
+    "آ": "ا",
+    "ٱ": "ا",
+    "ؤ": "و",
+})
+
+# اعراب، تنوین، تشدید، الف مقصوره بالا و کشیده (ـ)
+_DIACRITICS_RE = re.compile("[\u064b-\u065f\u0670\u0640]")
+# نیم‌فاصله و کاراکترهای جهت‌دهی/بی‌عرض
+_ZW_RE = re.compile("[\u200c\u200d\u200e\u200f\u00ad\ufeff]")
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+_SPACE_RE = re.compile(r"\s+")
+
+
+def normalize_text(value) -> str:
+    """
+    نرمال‌سازی متن فارسی/عربی برای جستجو:
+    ارقام فارسی/عربی => انگلیسی، ي/ك => ی/ک، حذف اعراب، نیم‌فاصله => فاصله، حروف کوچک.
+    """
+    if value is None:
+        return ""
+    v = normalize_digits(value)
+    v = v.translate(_CHAR_MAP)
+    v = _DIACRITICS_RE.sub("", v)
+    v = _ZW_RE.sub(" ", v)
+    v = v.lower()
+    return _SPACE_RE.sub(" ", v).strip()
+
+
+def tokenize(value) -> List[str]:
+    return _TOKEN_RE.findall(normalize_text(value))
+
+
+def tokenize_normalized(value) -> List[str]:
+    """
+    برای متنی که قبلاً normalize_text شده (مثل Product.search_text).
+    """
+    return _TOKEN_RE.findall(value or "")
@@ -2,6 +2,8 @@ from django.urls import path
 from .views import (
     ProductListAPIView,
     ProductSearchAPIView,  # ✅ اضافه شد برای جستجوی هوشمند
+    ProductSuggestAPIView,
+    ProductBatchAPIView,
     ProductDetailAPIView,
     CategoryTreeApi,
     CategoryFlat,
@@ -14,7 +16,13 @@ urlpatterns = [
     
     # ✅ آدرس جدید جستجوی هوشمند (باید قبل از آدرس ID قرار بگیرد تا تداخل ایجاد نشود)
     path("products/search/", ProductSearchAPIView.as_view(), name="product-search"),
+
+    # ✅ پیشنهاد لحظه‌ای (autocomplete) جعبه جستجو
+    path("products/suggest/", ProductSuggestAPIView.as_view(), name="product-suggest"),
     
+    # ✅ چند محصول در یک درخواست (سبد خرید / تسویه)
+    path("products/batch/", ProductBatchAPIView.as_view(), name="product-batch"),
+
     path("products/<int:pk>/", ProductDetailAPIView.as_view(), name="product-detail"),
 
     # --- بخش دسته‌بندی‌ها ---
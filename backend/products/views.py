@@ -1,30 +1,90 @@
-from django.db.models import Q, Case, When, Value, IntegerField # اضافه شدن ابزارهای امتیازدهی
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import generics, status
 from rest_framework.permissions import AllowAny
 
+from core.pagination import KeysetPagination
+
+from .cache import catalog_version, get_cached_detail, get_cached_search, set_cached_detail, set_cached_search
+from .category_index import get_category_index
+from .conditional import conditional_get, make_etag
+from .facets import get_facet_index, parse_facet_params
 from .models import Product, Category
+from .search import get_search_index
+from .suggest import get_suggest_index
+from .text import tokenize
 from .serializers import (
     ProductSerializer,
-    CategoryTreeSerializer,
-    CategoryFlatSerializer,
+    ProductCardSerializer,
 )
 
 
-def _collect_descendant_category_ids(category: Category):
+# ?ordering= => (ستون، id) ؛ همه با ایندکس‌های ترکیبی Product پوشش داده می‌شوند
+PRODUCT_ORDERINGS = {
+    "newest": ("-last_updated", "-id"),
+    "price": ("base_sale_price", "id"),
+    "-price": ("-base_sale_price", "-id"),
+}
+DEFAULT_PRODUCT_ORDERING = "newest"
+
+
+def _int_param(request, name):
+    try:
+        return int(request.query_params.get(name))
+    except (TypeError, ValueError):
+        return None
+
+
+# ستون‌هایی که حالت card لازم دارد (last_updated برای مرتب‌سازی/صفحه‌بندی)
+CARD_FIELDS = ("id", "title", "base_sale_price", "primary_image_url", "last_updated", "category", "category__slug")
+
+
+def _is_card_view(request) -> bool:
+    return (request.query_params.get("view") or "").strip().lower() == "card"
+
+
+def _product_queryset(request):
     """
-    همه زیرشاخه‌ها رو جمع می‌کنه تا محصولات زیرشاخه‌ها هم نمایش داده بشن.
+    کوئری‌ست پایه محصولات بر اساس حالت نمایش:
+    - view=card: فقط ستون‌های لازم (بدون media/specs/variants)
+    - پیش‌فرض: همه چیز برای ProductSerializer
     """
-    ids = [category.id]
-    queue = [category]
-    while queue:
-        node = queue.pop(0)
-        children = list(node.children.all())
-        for ch in children:
-            ids.append(ch.id)
-        queue.extend(children)
-    return ids
+    if _is_card_view(request):
+        return Product.objects.select_related("category").only(*CARD_FIELDS)
+    return Product.objects.select_related("category").prefetch_related("media", "specs", "variants")
+
+
+def _product_serializer_class(request):
+    return ProductCardSerializer if _is_card_view(request) else ProductSerializer
+
+
+def _filter_category_subtree(qs, index, category_id):
+    """
+    محصولات یک دسته و همه زیرشاخه‌هایش؛ با path یک کوئری ایندکس‌دار است.
+    """
+    path = index.paths.get(category_id)
+    if path:
+        return qs.filter(category__path__startswith=path)
+    return qs.filter(category_id__in=index.descendant_ids(category_id))
+
+
+def _apply_facet_filters(qs, request):
+    """
+    ?facet=نام:مقدار (قابل تکرار) از روی posting list های facet.
+    """
+    selected = parse_facet_params(request.query_params.getlist("facet"))
+    if not selected:
+        return qs
+    return qs.filter(id__in=get_facet_index().filter_ids(selected))
+
+
+def _wants_facets(request) -> bool:
+    return (request.query_params.get("facets") or "").strip().lower() in ("1", "true", "yes")
+
+
+def _facet_counts(qs):
+    # فقط id های نتیجه خوانده می‌شود؛ شمارش از ایندکس facet
+    return get_facet_index().counts(qs.order_by().values_list("id", flat=True))
 
 
 # ----------------------------------------------------------------
@@ -32,45 +92,44 @@ def _collect_descendant_category_ids(category: Category):
 # ----------------------------------------------------------------
 class ProductSearchAPIView(generics.ListAPIView):
     """
-    جستجویی که کلمات را جدا کرده و محصولات مرتبط‌تر (تطابق در عنوان) را بالاتر نشان می‌دهد.
+    جستجو روی ایندکس معکوس محصولات (products/search.py) با رتبه‌بندی BM25:
+    عنوان وزن بیشتری دارد و همه کلمات کوئری باید پیدا شوند.
+    نتیجه (فقط id ها) با کلید کوئری نرمال‌شده + limit و نسخه کاتالوگ کش می‌شود.
     """
     permission_classes = [AllowAny]
     serializer_class = ProductSerializer
 
+    default_limit = 6
+    max_limit = 50
+
+    def get_limit(self) -> int:
+        try:
+            limit = int(self.request.query_params.get("limit", self.default_limit))
+        except (TypeError, ValueError):
+            return self.default_limit
+        return max(1, min(limit, self.max_limit))
+
     def get_queryset(self):
-        # ۱. پاک‌سازی ورودی
         query = self.request.query_params.get("q", "").strip()
-        
+
         if len(query) < 2:
             return Product.objects.none()
 
-        # ۲. اصلاح کاراکترهای فارسی
-        query = query.replace('ي', 'ی').replace('ك', 'ک')
-        words = query.split()
-        
-        # ۳. فیلتر اولیه (محصولاتی که شامل تمام کلمات هستند)
-        queryset = Product.objects.prefetch_related("media", "specs", "variants").all()
-        for word in words:
-            queryset = queryset.filter(
-                Q(title__icontains=word) | Q(description__icontains=word)
-            )
+        terms = tokenize(query)
+        limit = self.get_limit()
+        ids = get_cached_search(terms, limit=limit)
+        if ids is None:
+            ids = get_search_index().search(query, limit=limit)
+            set_cached_search(terms, ids, limit=limit)
+        if not ids:
+            return Product.objects.none()
 
-        # ۴. سیستم امتیازدهی هوشمند (Ranking)
-        # اولویت ۱: تطابق کل عبارت در عنوان (۱۵ امتیاز)
-        # اولویت ۲: وجود کلمه اول سرچ در عنوان (۱۰ امتیاز)
-        # اولویت ۳: وجود عبارت در توضیحات (۲ امتیاز)
-        queryset = queryset.annotate(
-            search_rank=Case(
-                When(title__icontains=query, then=Value(15)),
-                When(title__icontains=words[0], then=Value(10)),
-                When(description__icontains=query, then=Value(2)),
-                default=Value(0),
-                output_field=IntegerField(),
-            )
-        )
+        # ترتیب خروجی = ترتیب امتیاز BM25
+        products = _product_queryset(self.request).in_bulk(ids)
+        return [products[pk] for pk in ids if pk in products]
 
-        # ۵. مرتب‌سازی: ابتدا بر اساس امتیاز (مرتبط‌ترین) و سپس جدیدترین‌ها
-        return queryset.order_by("-search_rank", "-last_updated").distinct()[:6]
+    def get_serializer_class(self):
+        return _product_serializer_class(self.request)
 
     def get_serializer_context(self):
         """
@@ -81,24 +140,95 @@ class ProductSearchAPIView(generics.ListAPIView):
         return ctx
 
 
+class ProductSuggestAPIView(APIView):
+    """
+    پیشنهاد لحظه‌ای جعبه جستجو (autocomplete) از آرایه پیشوندی داخل حافظه؛
+    بدون رفت‌وبرگشت دیتابیس.
+    """
+    permission_classes = [AllowAny]
+
+    default_limit = 8
+    max_limit = 20
+
+    def get(self, request):
+        query = request.query_params.get("q", "").strip()
+        try:
+            limit = int(request.query_params.get("limit", self.default_limit))
+        except (TypeError, ValueError):
+            limit = self.default_limit
+        limit = max(1, min(limit, self.max_limit))
+
+        if not query:
+            return Response([])
+        return Response(get_suggest_index().suggest(query, limit=limit))
+
+
+class ProductBatchAPIView(APIView):
+    """
+    چند محصول با یک درخواست (سبد خرید / تسویه): ?ids=1,2,3&view=card|full
+    - ترتیب خروجی = ترتیب ids؛ id های نامعتبر/ناموجود حذف می‌شوند
+    - تعداد کوئری ثابت است (یک کوئری برای هر رابطه، نه برای هر محصول)
+    """
+    permission_classes = [AllowAny]
+
+    max_ids = 100
+
+    def get(self, request):
+        ids = []
+        for raw in (request.query_params.get("ids") or "").split(","):
+            raw = raw.strip()
+            if raw.isdigit() and int(raw) not in ids:
+                ids.append(int(raw))
+
+        if len(ids) > self.max_ids:
+            return Response(
+                {"detail": f"حداکثر {self.max_ids} محصول در هر درخواست."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if not ids:
+            return Response([])
+
+        products = _product_queryset(request).in_bulk(ids)
+        serializer = _product_serializer_class(request)(
+            [products[pk] for pk in ids if pk in products],
+            many=True,
+            context={"request": request},
+        )
+        return Response(serializer.data)
+
+
 # ----------------------------------------------------------------
 # بقیه کلاس‌های قبلی (بدون تغییر)
 # ----------------------------------------------------------------
 
 class ProductListAPIView(generics.ListAPIView):
+    """
+    لیست محصولات.
+    با ?cursor= (صفحه اول خالی، همراه ?page_size=) صفحه‌بندی keyset روی (last_updated, id) فعال می‌شود
+    و خروجی {"next", "next_cursor", "results"} است؛ بدون آن‌ها همان لیست کامل قبلی.
+    با ?view=card خروجی سبک گرید (ProductCardSerializer) برمی‌گردد.
+    با ?facet=نام:مقدار فیلتر می‌شود و ?facets=1 شمارش facet ها را هم برمی‌گرداند
+    (در این حالت خروجی بدون صفحه‌بندی هم {"results", "facets"} است).
+    مرتب‌سازی: ?ordering=newest|price|-price و بازه قیمت: ?min_price= / ?max_price=
+    """
     permission_classes = [AllowAny]
     serializer_class = ProductSerializer
+    pagination_class = KeysetPagination
+
+    def get_keyset_ordering(self):
+        key = (self.request.query_params.get("ordering") or "").strip()
+        return PRODUCT_ORDERINGS.get(key, PRODUCT_ORDERINGS[DEFAULT_PRODUCT_ORDERING])
 
     def get_queryset(self):
-        qs = Product.objects.select_related("category").prefetch_related("media", "specs", "variants").all()
+        qs = _product_queryset(self.request)
         slug = self.request.query_params.get("category_slug")
         cat_id = self.request.query_params.get("category")
 
         if slug:
-            cat = Category.objects.filter(slug=slug).first()
+            index = get_category_index()
+            cat = index.get_by_slug(slug)
             if cat:
-                ids = _collect_descendant_category_ids(cat)
-                qs = qs.filter(category_id__in=ids)
+                qs = _filter_category_subtree(qs, index, cat["id"])
             else:
                 qs = qs.none()
 
@@ -108,7 +238,40 @@ class ProductListAPIView(generics.ListAPIView):
             except Exception:
                 pass
 
-        return qs.order_by("-last_updated")
+        min_price = _int_param(self.request, "min_price")
+        if min_price is not None:
+            qs = qs.filter(base_sale_price__gte=min_price)
+        max_price = _int_param(self.request, "max_price")
+        if max_price is not None:
+            qs = qs.filter(base_sale_price__lte=max_price)
+
+        qs = _apply_facet_filters(qs, self.request)
+
+        return qs.order_by(*self.get_keyset_ordering())
+
+    def get_serializer_class(self):
+        return _product_serializer_class(self.request)
+
+    def list(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+        if _wants_facets(request):
+            facets = _facet_counts(self.filter_queryset(self.get_queryset()))
+            if isinstance(response.data, dict):
+                response.data["facets"] = facets
+            else:
+                response.data = {"results": response.data, "facets": facets}
+        return response
+
+    def get_validators(self, request, *args, **kwargs):
+        # بدون کوئری: نسخه کاتالوگ (سیگنال‌ها و تغییر موجودی جلو می‌برند) + آدرس کامل
+        etag = make_etag(
+            "products", request.get_host(), request.get_full_path(), catalog_version(), get_category_index().version
+        )
+        return etag, None
+
+    @conditional_get
+    def get(self, request, *args, **kwargs):
+        return self.list(request, *args, **kwargs)
 
     def get_serializer_context(self):
         ctx = super().get_serializer_context()
@@ -117,10 +280,47 @@ class ProductListAPIView(generics.ListAPIView):
 
 
 class ProductDetailAPIView(generics.RetrieveAPIView):
+    """
+    جزئیات محصول؛ سند سریالایز شده در کش "products" نگه داشته می‌شود
+    و با سیگنال‌های products/signals.py پاک می‌شود.
+    """
     permission_classes = [AllowAny]
     serializer_class = ProductSerializer
     queryset = Product.objects.select_related("category").prefetch_related("media", "specs", "variants").all()
 
+    def retrieve(self, request, *args, **kwargs):
+        entry = get_cached_detail(kwargs.get("pk"), request)
+        if entry is None:
+            instance = self.get_object()
+            data = self.get_serializer(instance).data
+            entry = set_cached_detail(instance, request, data)
+        return Response(entry["data"])
+
+    def get_validators(self, request, *args, **kwargs):
+        pk = kwargs.get("pk")
+        entry = get_cached_detail(pk, request)
+        if entry is not None:
+            last = entry["last_updated"]
+        else:
+            last = Product.objects.filter(pk=pk).values_list("last_updated", flat=True).first()
+        if last is None:
+            return None, None
+        # موجودی بدون last_updated عوض می‌شود (orders.inventory)؛ نسخه کاتالوگ آن را پوشش می‌دهد
+        etag = make_etag(
+            "product",
+            request.get_host(),
+            request.get_full_path(),
+            pk,
+            last,
+            catalog_version(),
+            get_category_index().version,
+        )
+        return etag, None
+
+    @conditional_get
+    def get(self, request, *args, **kwargs):
+        return self.retrieve(request, *args, **kwargs)
+
     def get_serializer_context(self):
         ctx = super().get_serializer_context()
         ctx["request"] = self.request
@@ -130,18 +330,24 @@ class ProductDetailAPIView(generics.RetrieveAPIView):
 class CategoryTreeApi(APIView):
     permission_classes = [AllowAny]
 
+    def get_validators(self, request, *args, **kwargs):
+        return make_etag("category-tree", get_category_index().version), None
+
+    @conditional_get
     def get(self, request):
-        roots = Category.objects.filter(parent__isnull=True)
-        data = CategoryTreeSerializer(roots, many=True).data
-        return Response(data)
+        # درخت از قبل رندر شده در ایندکس دسته‌ها
+        return Response(get_category_index().tree)
 
 
 class CategoryFlat(APIView):
     permission_classes = [AllowAny]
 
     def get(self, request):
-        qs = Category.objects.all()
-        data = CategoryFlatSerializer(qs, many=True).data
+        data = get_category_index().flat
+        # ?counts=1 => تعداد محصولات هر دسته با زیرشاخه‌ها (یک کوئری SQL)
+        if request.query_params.get("counts"):
+            counts = dict(Category.objects.with_product_counts().values_list("id", "product_count"))
+            data = [{**row, "product_count": counts.get(row["id"]) or 0} for row in data]
         return Response(data)
 
 
@@ -151,27 +357,36 @@ class CategoryDetailApi(APIView):
     """
     permission_classes = [AllowAny]
 
+    def get_validators(self, request, slug, *args, **kwargs):
+        index = get_category_index()
+        if not index.get_by_slug(slug):
+            return None, None
+        etag = make_etag("category", request.get_host(), request.get_full_path(), catalog_version(), index.version)
+        return etag, None
+
+    @conditional_get
     def get(self, request, slug):
-        category = Category.objects.filter(slug=slug).first()
+        index = get_category_index()
+        category = index.get_by_slug(slug)
         if not category:
             return Response(
                 {"detail": "این دسته‌بندی وجود ندارد."},
                 status=status.HTTP_404_NOT_FOUND,
             )
 
-        ids = _collect_descendant_category_ids(category)
-        products = Product.objects.select_related("category").prefetch_related("media", "specs", "variants").filter(
-            category_id__in=ids
-        ).order_by("-last_updated")
-
-        return Response(
-            {
-                "category": {
-                    "id": category.id,
-                    "title": category.title,
-                    "slug": category.slug,
-                    "parent": category.parent_id,
-                },
-                "products": ProductSerializer(products, many=True, context={"request": request}).data,
-            }
-        )
\ No newline at end of file
+        products = _filter_category_subtree(_product_queryset(request), index, category["id"])
+        products = _apply_facet_filters(products, request).order_by("-last_updated")
+        serializer_class = _product_serializer_class(request)
+
+        data = {
+            "category": {
+                "id": category["id"],
+                "title": category["title"],
+                "slug": category["slug"],
+                "parent": category["parent"],
+            },
+            "products": serializer_class(products, many=True, context={"request": request}).data,
+        }
+        if _wants_facets(request):
+            data["facets"] = _facet_counts(products)
+        return Response(data)
\ No newline at end of file